@@ -1,99 +1,271 @@
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from pyod.models.iforest import IForest
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 import pandas as pd
+from .metrics import ANOMALIES_DETECTED, timed
+from .logging_setup import get_logger
+from .log_batch import LogBatch, extract_number
+
+logger = get_logger(__name__)
+
+# Fixed codes so a level means the same thing in every batch and partition
+LEVEL_CODES = {"DEBUG": 0, "INFO": 1, "WARNING": 2, "ERROR": 3, "CRITICAL": 4, "FATAL": 5}
+# Columns fed to the per-service models; service_code is constant within a partition
+MODEL_FEATURES = ['level_code', 'cpu_usage', 'memory_usage', 'response_time',
+                  'execution_time', 'has_error', 'is_blocked']
+# Context from the per-minute rollups, added when a RollupEngine is supplied
+ROLLUP_FEATURES = ['minute_error_rate', 'minute_latency_p95']
+# Fewest rows a model is fitted on; smaller services are scored by the fallback
+MIN_SERVICE_ROWS = 20
+# Pooled model fitted on every service's rows, for services without a model of their own
+FALLBACK_MODEL = "__all__"
+# detect() only replaces a model with one fitted on at least this share of its rows,
+# so a small ingest batch does not overwrite a model trained on more history
+REFIT_MIN_FRACTION = 0.5
+# Layout of export_model() blobs; older blobs are refitted rather than loaded
+MODEL_FORMAT = 2
+
+
+def _as_batch(logs: Union[LogBatch, List[Dict]]) -> LogBatch:
+    return logs if isinstance(logs, LogBatch) else LogBatch.from_records(logs)
+
 
 class AnomalyDetector:
-    def __init__(self, contamination: float = 0.1):
-        self.model = IForest(contamination=contamination, random_state=42)
-        self.is_fitted = False
+    """Registry of IForest models, one per service
+
+    Each service is scored against its own baseline, so web-server latency
+    and database execution_time no longer share one decision boundary.
+    Partitions are fitted and scored in parallel on a thread pool (the
+    sklearn tree code releases the GIL), and only services whose data
+    changed since their last fit are retrained. Services with too few rows
+    for a model of their own are scored by a fallback fitted on all rows.
+    """
 
-    def _prepare_features(self, logs: List[Dict]) -> pd.DataFrame:
+    def __init__(self, contamination: float = 0.1,
+                 service_contamination: Optional[Dict[str, float]] = None,
+                 max_workers: Optional[int] = None, rollups=None):
+        self.contamination = contamination
+        self.rollups = rollups
+        self.features = MODEL_FEATURES + (ROLLUP_FEATURES if rollups is not None else [])
+        self.service_contamination = dict(service_contamination or {})
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.models: Dict[str, IForest] = {}
+        self.fingerprints: Dict[str, int] = {}
+        # Rows each model was fitted on
+        self.fit_rows: Dict[str, int] = {}
+        # Bumped whenever any service model is (re)fitted
+        self.revision = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        return bool(self.models)
+
+    def set_contamination(self, service: str, contamination: float):
+        """Change one service's contamination; only that service is refitted next time"""
+        self.service_contamination[service] = contamination
+        self.fingerprints.pop(service, None)
+
+    def _prepare_features(self, logs: LogBatch) -> pd.DataFrame:
         """Convert log entries to numerical features with robust handling of missing values"""
-        df = pd.DataFrame(logs)
-        
+        with timed("feature_prep"):
+            return self._build_features(logs)
+
+    def _build_features(self, logs: LogBatch) -> pd.DataFrame:
+        df = logs.frame
+
         # Ensure required columns exist
         required_columns = ['timestamp', 'level', 'service', 'message']
         missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
             raise ValueError(f"Missing required columns: {missing_columns}")
-            
-        # Convert categorical columns to numerical
-        df['level_code'] = pd.Categorical(df['level']).codes
-        df['service_code'] = pd.Categorical(df['service']).codes
-        
-        # Extract numerical values safely
-        def safe_extract_number(value):
-            if pd.isna(value):
-                return 0
-            if isinstance(value, str):
-                # Extract first number from string
-                import re
-                numbers = re.findall(r'\d+(?:\.\d+)?', value)
-                return float(numbers[0]) if numbers else 0
-            return float(value) if value else 0
+
+        # Build features in a new frame so the batch's raw columns stay untouched
+        level = df['level'].astype(str)
+        X = pd.DataFrame(index=df.index)
+        X['level_code'] = level.map(LEVEL_CODES).fillna(-1).astype(int)
+        X['service_code'] = pd.Categorical(df['service']).codes
 
         # Safely convert percentage strings and other numerical fields
-        df['cpu_usage'] = df['cpu_usage'].apply(safe_extract_number)
-        df['memory_usage'] = df['memory_usage'].str.rstrip('%').apply(safe_extract_number)
-        df['response_time'] = df['response_time'].str.rstrip('ms').apply(safe_extract_number)
-        df['execution_time'] = df['execution_time'].str.rstrip('ms').apply(safe_extract_number)
+        for column in ['cpu_usage', 'memory_usage', 'response_time', 'execution_time']:
+            X[column] = extract_number(df[column]) if column in df.columns else 0.0
 
         # Add error indicators
-        df['has_error'] = df['level'].isin(['ERROR', 'CRITICAL', 'WARNING']).astype(int)
-        df['is_blocked'] = df['message'].str.contains('blocked', case=False, na=False).astype(int)
-        
-        features = ['level_code', 'service_code', 'cpu_usage', 'memory_usage', 
-                   'response_time', 'execution_time', 'has_error', 'is_blocked']
-                   
-        return df[features].fillna(0)
-
-    def fit(self, logs: List[Dict]):
-        """Train the anomaly detection model"""
+        X['has_error'] = level.isin(['ERROR', 'CRITICAL', 'WARNING']).astype(int)
+        X['is_blocked'] = df['message'].astype('string').str.contains('blocked', case=False, na=False).astype(int)
+
+        if self.rollups is not None:
+            X[ROLLUP_FEATURES] = self.rollups.row_features(logs)
+
+        X = X.fillna(0)
+        X['service'] = df['service'].astype(object).where(df['service'].notna(), 'unknown').astype(str)
+        return X
+
+    def _partitions(self, X: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Row positions to score per model: one per service, the rest pooled into the fallback
+
+        A small partition still uses its own service's model if one was
+        trained earlier on more data.
+        """
+        partitions: Dict[str, np.ndarray] = {}
+        small = []
+        for service, positions in X.groupby('service', sort=False).indices.items():
+            if service in self.models:
+                partitions[service] = positions
+            else:
+                small.append(positions)
+        if small:
+            partitions[FALLBACK_MODEL] = np.concatenate(small)
+        return partitions
+
+    def _contamination(self, service: str) -> float:
+        return self.service_contamination.get(service, self.contamination)
+
+    def _fit_partition(self, service: str, X: pd.DataFrame) -> IForest:
+        model = IForest(contamination=self._contamination(service), random_state=42)
+        model.fit(X[self.features].to_numpy(dtype=float))
+        return model
+
+    def _fingerprint(self, X: pd.DataFrame) -> int:
+        return int(pd.util.hash_pandas_object(X[self.features], index=False).sum())
+
+    def export_model(self) -> bytes:
+        """Serialize the fitted models so other workers can load them"""
+        return pickle.dumps({"format": MODEL_FORMAT, "features": self.features, "models": self.models,
+                             "fingerprints": self.fingerprints, "fit_rows": self.fit_rows})
+
+    def load_model(self, blob: bytes) -> bool:
+        """Replace the models with ones produced by export_model
+
+        Returns False and keeps the current models if the blob was written
+        in an older format or fitted on other features (e.g. by a worker with
+        a different ROLLUP_FEATURES setting), so the next detect() fits fresh
+        ones. Models
+        fitted with a contamination other than this detector's setting are
+        loaded but refitted on the next detect().
+        """
+        state = pickle.loads(blob)
+        if not isinstance(state, dict) or state.get("format") != MODEL_FORMAT:
+            logger.warning("Ignoring anomaly model in an outdated format; refitting")
+            return False
+        if state["features"] != self.features:
+            logger.warning("Ignoring anomaly model fitted on other features; refitting",
+                           extra={"model_features": state["features"], "features": self.features})
+            return False
+
+        self.models = state["models"]
+        self.fingerprints = {service: fingerprint for service, fingerprint in state["fingerprints"].items()
+                             if self.models[service].contamination == self._contamination(service)}
+        self.fit_rows = state["fit_rows"]
+        self.revision += 1
+        return True
+
+    def fit(self, logs: Union[LogBatch, List[Dict]], only_missing: bool = False):
+        """Train per-service models, skipping services whose data is unchanged
+
+        With only_missing, services that already have a model are left alone
+        (e.g. to top up a loaded model with services it lacks), unless it was
+        fitted with another contamination than this detector's.
+        """
         if not logs:
             return
-            
+
         try:
-            X = self._prepare_features(logs)
-            self.model.fit(X)
-            self.is_fitted = True
+            X = self._prepare_features(_as_batch(logs))
+            self._fit_frame(X, only_missing)
         except Exception as e:
-            print(f"Error fitting model: {str(e)}")
-            self.is_fitted = False
+            logger.exception("Error fitting model: %s", e)
+
+    def _needs_fit(self, service: str, fingerprint: int, rows: int, min_fraction: float) -> bool:
+        # No model yet, or its fingerprint was cleared by set_contamination
+        if service not in self.models or service not in self.fingerprints:
+            return True
+        if self.fingerprints[service] == fingerprint:
+            return False
+        return rows >= min_fraction * self.fit_rows.get(service, 0)
+
+    def _fit_frame(self, X: pd.DataFrame, only_missing: bool = False, min_fraction: float = 0.0):
+        candidates = {service: positions for service, positions in X.groupby('service', sort=False).indices.items()
+                      if len(positions) >= MIN_SERVICE_ROWS}
+        if len(X) >= MIN_SERVICE_ROWS:
+            candidates[FALLBACK_MODEL] = np.arange(len(X))
+
+        pending = {}
+        for service, positions in candidates.items():
+            if only_missing and service in self.models and service in self.fingerprints:
+                continue
+            partition = X.iloc[positions]
+            fingerprint = self._fingerprint(partition)
+            if self._needs_fit(service, fingerprint, len(positions), min_fraction):
+                pending[service] = (partition, fingerprint)
+
+        if not pending:
+            return
 
-    def detect(self, logs: List[Dict]) -> List[Dict]:
-        """Detect anomalies in new logs with robust error handling"""
+        with timed("model_fit"), ThreadPoolExecutor(self.max_workers) as pool:
+            futures = {service: pool.submit(self._fit_partition, service, partition)
+                       for service, (partition, _) in pending.items()}
+            for service, future in futures.items():
+                partition, fingerprint = pending[service]
+                self.models[service] = future.result()
+                self.fingerprints[service] = fingerprint
+                self.fit_rows[service] = len(partition)
+        self.revision += 1
+        logger.info("Fitted service models", extra={"services": sorted(pending), "revision": self.revision})
+
+    def _score_partition(self, service: str, X: pd.DataFrame):
+        model = self.models[service]
+        scores = model.decision_function(X[self.features].to_numpy(dtype=float))
+        # Same rule as pyod's predict(), without scoring the partition a second time
+        return scores, (scores > model.threshold_).astype(int)
+
+    def detect(self, logs: Union[LogBatch, List[Dict]], refit: bool = True) -> List[Dict]:
+        """Detect anomalies in new logs with robust error handling
+
+        Only the anomalous rows are materialized as dicts. With refit=False
+        the current models only score the batch and are never (re)fitted,
+        e.g. so every backfill partition is scored by the same models.
+        """
         if not logs:
             return []
-            
+
         try:
+            logs = _as_batch(logs)
             X = self._prepare_features(logs)
-            
-            # Fit on current batch if model not trained
-            if not self.is_fitted:
-                self.fit(logs)
-                
+
+            # Fit new services and refit ones whose data changed (or whose
+            # contamination was changed) if the batch has enough rows for it
+            if refit:
+                self._fit_frame(X, min_fraction=REFIT_MIN_FRACTION)
+
             if not self.is_fitted:  # If fitting failed
                 return []
-                
-            # Get anomaly scores and labels
-            scores = self.model.decision_function(X)
-            labels = self.model.predict(X)
-            
-            anomalies = []
-            for idx, (log, score, label) in enumerate(zip(logs, scores, labels)):
-                if label == 1:  # Anomaly detected
-                    anomaly = log.copy()
-                    # Convert timestamp to ISO format string if it's a pandas Timestamp
-                    if 'timestamp' in anomaly and isinstance(anomaly['timestamp'], pd.Timestamp):
-                        anomaly['timestamp'] = anomaly['timestamp'].isoformat()
-                    anomaly.update({
-                        'anomaly_score': float(score),
-                        'anomaly_features': X.iloc[idx].to_dict()
-                    })
-                    anomalies.append(anomaly)
-                    
+
+            # Get anomaly scores and labels, one partition per service
+            scores = np.zeros(len(X))
+            labels = np.zeros(len(X), dtype=int)
+            partitions = {service: positions for service, positions in self._partitions(X).items()
+                          if service in self.models}
+            with timed("model_score"), ThreadPoolExecutor(self.max_workers) as pool:
+                futures = {service: pool.submit(self._score_partition, service, X.iloc[positions])
+                           for service, positions in partitions.items()}
+                for service, future in futures.items():
+                    positions = partitions[service]
+                    scores[positions], labels[positions] = future.result()
+
+            anomaly_positions = np.flatnonzero(labels == 1)  # Anomaly detected
+            anomalies = logs.records(anomaly_positions)
+            features = X.drop(columns='service').iloc[anomaly_positions].to_dict('records')
+            for anomaly, idx, anomaly_features in zip(anomalies, anomaly_positions, features):
+                anomaly.update({
+                    'anomaly_score': float(scores[idx]),
+                    'anomaly_features': anomaly_features
+                })
+                ANOMALIES_DETECTED.inc(service=anomaly.get('service') or 'unknown')
+
             return anomalies
         except Exception as e:
-            print(f"Error detecting anomalies: {str(e)}")
-            return []
\ No newline at end of file
+            logger.exception("Error detecting anomalies: %s", e)
+            return []
@@ -0,0 +1,211 @@
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+from .metrics import timed
+from .logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+
+def _epoch_seconds(timestamp) -> float:
+    """Epoch seconds; naive datetimes are UTC, as in rollups and backfill"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    moment = timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(
+        str(timestamp).replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _anomaly_key(anomaly: Dict) -> str:
+    """Identity of the underlying log row, so re-detecting it updates instead of duplicating"""
+    row = {k: v for k, v in anomaly.items() if k not in ("anomaly_score", "anomaly_features")}
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _encode_cursor(order: str, value, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([order, value, row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, order: str):
+    try:
+        cursor_order, value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed cursor")
+    if cursor_order != order:
+        raise ValueError(f"Cursor was issued for order={cursor_order}")
+    return value, row_id
+
+
+class AnomalyStore:
+    """Detected anomalies persisted in a local SQLite file
+
+    Rows keep the fields used for lookups in their own columns and the
+    full anomaly (including anomaly_score and anomaly_features) as JSON.
+    `source` records what produced a row: "live" for the API pipeline or
+    "backfill:<run_id>" for a backfill run. A row detected again by the
+    same source is updated in place. Backfill checkpoints live in the same
+    file so a partition's anomalies and its checkpoint commit together.
+
+    Indexes on time, service, score and error_code (with id as a tiebreaker)
+    serve search(): range filters and top-k by score read only the index
+    range they need, and pages continue from a cursor (keyset pagination)
+    rather than an OFFSET, so deep pages cost the same as the first.
+    """
+
+    def __init__(self, path: str = "./state/anomalies.db"):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS anomalies ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, service TEXT, level TEXT, "
+                         "error_code TEXT, score REAL, source TEXT NOT NULL, payload TEXT NOT NULL)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(anomalies)")}
+            if "key" not in columns:
+                conn.execute("ALTER TABLE anomalies ADD COLUMN key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_source ON anomalies (source)")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS anomalies_source_key ON anomalies (source, key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_ts ON anomalies (ts, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_score ON anomalies (score, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_service_ts ON anomalies (service, ts, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_service_score ON anomalies (service, score, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS anomalies_error_code_ts ON anomalies (error_code, ts, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                         "run_id TEXT NOT NULL, partition_start REAL NOT NULL, rows INTEGER NOT NULL, "
+                         "anomalies INTEGER NOT NULL, finished_at REAL NOT NULL, "
+                         "PRIMARY KEY (run_id, partition_start))")
+        self.analyze()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Sample-based ANALYZE: milliseconds even on large tables
+            conn.execute("PRAGMA analysis_limit=1000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _row(anomaly: Dict, source: str) -> tuple:
+        error_code = anomaly.get("error_code")
+        return (_epoch_seconds(anomaly["timestamp"]), anomaly.get("service"), anomaly.get("level"),
+                None if error_code is None else str(error_code), anomaly.get("anomaly_score"), source,
+                _anomaly_key(anomaly), json.dumps(anomaly, default=str))
+
+    def _insert(self, conn: sqlite3.Connection, anomalies: List[Dict], source: str):
+        conn.executemany("INSERT INTO anomalies (ts, service, level, error_code, score, source, key, payload) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                         "ON CONFLICT (source, key) DO UPDATE SET score = excluded.score, payload = excluded.payload",
+                         [self._row(anomaly, source) for anomaly in anomalies])
+
+    def add(self, anomalies: List[Dict], source: str = "live") -> int:
+        if not anomalies:
+            return 0
+        with timed("anomaly_store_write"), self._transaction() as conn:
+            self._insert(conn, anomalies, source)
+        return len(anomalies)
+
+    def analyze(self):
+        """Refresh the statistics SQLite uses to pick an index for each search"""
+        self._connection().execute("ANALYZE")
+
+    # Backfill checkpoints
+
+    def complete_partition(self, run_id: str, partition_start: float, rows: int, anomalies: List[Dict]):
+        """Store a backfill partition's anomalies and mark it done, atomically"""
+        with timed("anomaly_store_write"), self._transaction() as conn:
+            self._insert(conn, anomalies, f"backfill:{run_id}")
+            conn.execute("INSERT OR REPLACE INTO checkpoints (run_id, partition_start, rows, anomalies, finished_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (run_id, partition_start, rows, len(anomalies), time.time()))
+
+    def completed_partitions(self, run_id: str) -> Set[float]:
+        rows = self._connection().execute(
+            "SELECT partition_start FROM checkpoints WHERE run_id = ?", (run_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def reset_run(self, run_id: str):
+        """Forget a backfill run's checkpoints and the anomalies it stored"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM anomalies WHERE source = ?", (f"backfill:{run_id}",))
+            conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+    def count(self, source: Optional[str] = None) -> int:
+        if source is None:
+            return self._connection().execute("SELECT COUNT(*) FROM anomalies").fetchone()[0]
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM anomalies WHERE source = ?", (source,)).fetchone()[0]
+
+    # Queries
+
+    def search(self, services: Optional[Sequence[str]] = None, levels: Optional[Sequence[str]] = None,
+               error_codes: Optional[Sequence[str]] = None, start: Optional[datetime] = None,
+               end: Optional[datetime] = None, min_score: Optional[float] = None, source: Optional[str] = None,
+               order: str = "time", limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Filtered anomalies, newest first (order="time") or highest score first (order="score")
+
+        Returns {"items": [...], "next_cursor": ...}; pass next_cursor back
+        to get the following page. Top-k by score is order="score", limit=k.
+        """
+        if order not in ("time", "score"):
+            raise ValueError("order must be 'time' or 'score'")
+        column = "ts" if order == "time" else "score"
+
+        clauses, params = [], []
+        for name, values in (("service", services), ("level", levels), ("error_code", error_codes)):
+            if values:
+                clauses.append(f"{name} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_epoch_seconds(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_epoch_seconds(end))
+        if min_score is not None:
+            clauses.append("score >= ?")
+            params.append(min_score)
+        if order == "score":
+            clauses.append("score IS NOT NULL")
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if cursor:
+            value, row_id = _decode_cursor(cursor, order)
+            clauses.append(f"({column} < ? OR ({column} = ? AND id < ?))")
+            params.extend([value, value, row_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = (f"SELECT id, {column}, payload FROM anomalies {where} "
+                 f"ORDER BY {column} DESC, id DESC LIMIT ?")
+        with timed("anomaly_search"):
+            rows = self._connection().execute(query, params + [limit + 1]).fetchall()
+
+        items = [{"id": row_id, **json.loads(payload)} for row_id, _, payload in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            row_id, value, _ = rows[limit - 1]
+            next_cursor = _encode_cursor(order, value, row_id)
+        return {"items": items, "next_cursor": next_cursor}
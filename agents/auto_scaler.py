@@ -1,6 +1,58 @@
-from typing import Dict, List
-import json
+import math
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
 from pathlib import Path
+from .logging_setup import get_logger
+from .state_store import file_lock, read_json, update_json, write_json_atomic
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+INITIAL_SERVICES = {
+    "web-server": {"instances": 1, "min_instances": 1, "max_instances": 5},
+    "database": {"instances": 1, "min_instances": 1, "max_instances": 3},
+    "auth-service": {"instances": 1, "min_instances": 1, "max_instances": 3},
+    "payment-service": {"instances": 1, "min_instances": 1, "max_instances": 3},
+}
+
+# Predictive policy settings; a service can override any of them under
+# "policy" in its scaling state entry
+PREDICTIVE_DEFAULTS = {
+    "method": "holt_winters",       # or "ewma"
+    "history_minutes": 60,          # load history fed to the forecast
+    "horizon_minutes": 5,           # how far ahead to provision (instance startup time)
+    "season_minutes": None,         # e.g. 60 for an hourly pattern
+    "capacity_per_instance": 3.0,   # log events per minute one instance absorbs
+    # Tuned with simulate_scaling.py on large_logs.csv: against the reactive policy this
+    # uses ~19% fewer instance-minutes with less overload and fewer SLO violations.
+    # Higher utilization or shorter cooldowns cut cost further but overload more often.
+    "target_utilization": 0.6,
+    "hysteresis": 0.35,             # scale down only below (1 - hysteresis) of the target
+    "latency_slo_ms": 1000.0,       # recent p95 above this adds an instance
+    "scale_up_cooldown_s": 60,
+    "scale_down_cooldown_s": 900,
+}
+
+def history_minutes(state: Dict) -> int:
+    """Longest load history any service's predictive policy forecasts from"""
+    return max((info.get('policy', {}).get('history_minutes', PREDICTIVE_DEFAULTS['history_minutes'])
+                for info in state['services'].values()), default=PREDICTIVE_DEFAULTS['history_minutes'])
+
+def _to_number(value) -> float:
+    """Parse values like 85, "85%", "1200ms" or NaN into a float (0 if missing)"""
+    if isinstance(value, str):
+        value = value.strip().rstrip('%').rstrip('ms')
+        try:
+            return float(value) if value else 0.0
+        except ValueError:
+            return 0.0
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if number != number else number
 
 class AutoScaler:
     def __init__(self, config_path: str = "./config"):
@@ -11,72 +63,205 @@ class AutoScaler:
         
     def _initialize_state(self):
         """Initialize or load scaling state"""
-        if not self.state_file.exists():
-            initial_state = {
-                "services": {
-                    "web-server": {"instances": 1, "max_instances": 5},
-                    "database": {"instances": 1, "max_instances": 3},
-                    "auth-service": {"instances": 1, "max_instances": 3},
-                    "payment-service": {"instances": 1, "max_instances": 3}
-                }
-            }
-            with open(self.state_file, 'w') as f:
-                json.dump(initial_state, f, indent=2)
-        
+        with file_lock(self.state_file):
+            if self.state_file.exists():
+                return
+            write_json_atomic(self.state_file, self._initial_state())
+
+    def _initial_state(self) -> Dict:
+        return {"services": {service: dict(info) for service, info in INITIAL_SERVICES.items()}}
+
     def evaluate_scaling(self, anomalies: List[Dict]) -> List[Dict]:
         """Evaluate scaling decisions based on anomalies"""
         scaling_actions = []
-        
-        with open(self.state_file, 'r') as f:
-            state = json.load(f)
-        
+
+        # Decide and persist under the file lock so concurrent workers can't
+        # both scale from the same instance count
+        def apply(state: Dict) -> Dict:
+            scaling_actions[:] = self.plan_reactive(state, anomalies)
+            return state
+
+        update_json(self.state_file, apply)
+        return scaling_actions
+
+    def history_minutes(self) -> int:
+        """Minutes of rollups evaluate_predictive() needs in `load`"""
+        return history_minutes(read_json(self.state_file, default=self._initial_state()))
+
+    def evaluate_predictive(self, load: "pd.DataFrame", now: Optional[float] = None) -> List[Dict]:
+        """Scale every service to its forecast demand
+
+        `load` is per-service, per-minute rollups as returned by
+        RollupEngine.frame(): columns service, minute, count, and the
+        response/execution time p95s.
+        """
+        scaling_actions = []
+
+        def apply(state: Dict) -> Dict:
+            scaling_actions[:] = self.plan_predictive(state, load, now)
+            return state
+
+        update_json(self.state_file, apply)
+        return scaling_actions
+
+    def plan_reactive(self, state: Dict, anomalies: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Apply the anomaly-driven policy to `state` in place and return the actions"""
+        scaling_actions = []
         for anomaly in anomalies:
-            service = anomaly.get('service')
-            if not service or service not in state['services']:
-                continue
-                
-            service_state = state['services'][service]
-            current_instances = service_state['instances']
-            max_instances = service_state['max_instances']
-            
-            # Scale up on high CPU/memory usage or response time issues
-            should_scale = (
-                anomaly.get('cpu_usage', 0) > 80 or
-                (anomaly.get('memory_usage', '0%').rstrip('%')) > '80' or
-                (anomaly.get('response_time', '0').rstrip('ms')) > '1000'
-            )
-            
-            if should_scale and current_instances < max_instances:
-                service_state['instances'] += 1
-                scaling_actions.append({
-                    'service': service,
-                    'action': 'scale_up',
-                    'from_instances': current_instances,
-                    'to_instances': current_instances + 1,
-                    'reason': 'High resource usage or response time'
-                })
-        
-        # Save updated state
-        with open(self.state_file, 'w') as f:
-            json.dump(state, f, indent=2)
-            
+            self._apply_anomaly(state, anomaly, scaling_actions, now)
         return scaling_actions
-    
+
+    def plan_predictive(self, state: Dict, load: "pd.DataFrame", now: Optional[float] = None) -> List[Dict]:
+        """Apply the forecast-driven policy to `state` in place and return the actions
+
+        Targets are sized for the peak forecast over the provisioning horizon.
+        Scale-ups may add several instances at once; scale-downs remove one
+        at a time, and only when the forecast is below the target band by the
+        hysteresis margin. Cooldowns are measured against `now` (epoch
+        seconds), which the simulation sets to the replayed minute.
+        """
+        now = time.time() if now is None else now
+        services = [service for service in state['services'] if not load.empty and service in set(load['service'])]
+        if not services:
+            return []
+
+        policies = {service: {**PREDICTIVE_DEFAULTS, **state['services'][service].get('policy', {})}
+                    for service in services}
+        forecasts = self.forecast_load(load, services, policies)
+
+        scaling_actions = []
+        for service in services:
+            peak, latency = forecasts[service]
+            self._apply_forecast(state['services'][service], service, peak, latency,
+                                 policies[service], now, scaling_actions)
+        return scaling_actions
+
+    def forecast_load(self, load: "pd.DataFrame", services: List[str], policies: Dict[str, Dict]) -> Dict:
+        """Peak forecast events/minute and recent p95 latency per service
+
+        Services that share forecast settings are forecast together as one matrix.
+        """
+        # Imported here so reset/status commands don't load numpy and pandas
+        import numpy as np
+        from .forecasting import ewma, holt_winters
+
+        end = int(load['minute'].max())
+        counts = load.pivot_table(index='service', columns='minute', values='count', aggfunc='sum')
+        latency = load.assign(latency=load[['response_time_p95', 'execution_time_p95']].astype(float).max(axis=1))
+
+        groups: Dict[tuple, List[str]] = {}
+        for service in services:
+            policy = policies[service]
+            key = (policy['method'], policy['history_minutes'], policy['horizon_minutes'], policy['season_minutes'])
+            groups.setdefault(key, []).append(service)
+
+        forecasts = {}
+        for (method, history, horizon, season), group in groups.items():
+            minutes = range(end - history + 1, end + 1)
+            matrix = counts.reindex(index=group, columns=minutes).fillna(0).to_numpy()
+            if method == "ewma":
+                peaks = ewma(matrix)[:, -1]
+            else:
+                peaks = holt_winters(matrix, horizon, season=season).max(axis=1)
+            recent = latency[(latency['minute'] > end - horizon) & latency['service'].isin(group)]
+            recent_p95 = recent.groupby('service')['latency'].max()
+            for service, peak in zip(group, peaks):
+                forecasts[service] = (float(peak), float(np.nan_to_num(recent_p95.get(service, 0.0))))
+        return forecasts
+
+    def _apply_forecast(self, service_state: Dict, service: str, peak: float, latency_p95: float,
+                        policy: Dict, now: float, scaling_actions: List[Dict]):
+        current = service_state['instances']
+        min_instances = service_state.get('min_instances', 1)
+        max_instances = service_state['max_instances']
+        per_instance = policy['capacity_per_instance'] * policy['target_utilization']
+
+        target = math.ceil(peak / per_instance) if per_instance > 0 else current
+        slow = latency_p95 > policy['latency_slo_ms']
+        if slow:
+            target = max(target, current + 1)
+        target = min(max(target, min_instances), max_instances)
+
+        if target > current:
+            if now - service_state.get('last_scale_up_at', 0) < policy['scale_up_cooldown_s']:
+                return
+            reason = (f"Forecast {peak:.1f} events/min" if not slow
+                      else f"p95 latency {latency_p95:.0f}ms above SLO")
+            self._record(service_state, service, 'scale_up', current, target, reason, now, scaling_actions)
+        elif target < current:
+            # Hysteresis: one fewer instance must still leave headroom below the target band
+            band = (current - 1) * per_instance * (1 - policy['hysteresis'])
+            recently_scaled = now - max(service_state.get('last_scale_up_at', 0),
+                                        service_state.get('last_scale_down_at', 0)) < policy['scale_down_cooldown_s']
+            if peak >= band or latency_p95 > policy['latency_slo_ms'] * (1 - policy['hysteresis']) or recently_scaled:
+                return
+            self._record(service_state, service, 'scale_down', current, current - 1,
+                         f"Forecast {peak:.1f} events/min", now, scaling_actions)
+
+    def _record(self, service_state: Dict, service: str, action: str, current: int, target: int,
+                reason: str, now: float, scaling_actions: List[Dict]):
+        service_state['instances'] = target
+        service_state['last_scale_up_at' if action == 'scale_up' else 'last_scale_down_at'] = now
+        scaling_actions.append({
+            'service': service,
+            'action': action,
+            'from_instances': current,
+            'to_instances': target,
+            'reason': reason
+        })
+        logger.info("Scaling %s %s", "up" if action == 'scale_up' else "down", service,
+                    extra={"from_instances": current, "to_instances": target, "reason": reason})
+
+    def _apply_anomaly(self, state: Dict, anomaly: Dict, scaling_actions: List[Dict],
+                       now: Optional[float] = None):
+        """Scale up the anomaly's service in `state` if its resource usage warrants it"""
+        service = anomaly.get('service')
+        if not service or service not in state['services']:
+            return
+
+        service_state = state['services'][service]
+        current_instances = service_state['instances']
+        max_instances = service_state['max_instances']
+
+        # Scale up on high CPU/memory usage or response time issues
+        should_scale = (
+            _to_number(anomaly.get('cpu_usage')) > 80 or
+            _to_number(anomaly.get('memory_usage')) > 80 or
+            _to_number(anomaly.get('response_time')) > 1000
+        )
+
+        if should_scale and current_instances < max_instances:
+            self._record(service_state, service, 'scale_up', current_instances, current_instances + 1,
+                         'High resource usage or response time',
+                         time.time() if now is None else now, scaling_actions)
+
     def get_service_status(self) -> Dict:
         """Get current scaling status of all services"""
-        with open(self.state_file, 'r') as f:
-            state = json.load(f)
+        state = read_json(self.state_file)
         
         # Transform the data into the format expected by frontend
         formatted_status = {}
         for service, info in state['services'].items():
             formatted_status[service] = {
                 'current_instances': info['instances'],
-                'min_instances': 1,  # Default minimum
+                'min_instances': info.get('min_instances', 1),
                 'max_instances': info['max_instances']
             }
         return formatted_status
     
     def reset_scaling(self):
-        """Reset all services to initial state"""
-        self._initialize_state()
\ No newline at end of file
+        """Scale every service back to its minimum instance count
+
+        Only `instances` is reset: per-service limits, "policy" overrides and
+        cooldown timestamps are kept. Services missing from the file are
+        added with their initial settings.
+        """
+        def apply(state: Dict) -> Dict:
+            services = state.setdefault('services', {})
+            for service, info in INITIAL_SERVICES.items():
+                services.setdefault(service, dict(info))
+            for info in services.values():
+                info['instances'] = info.get('min_instances', 1)
+            return state
+
+        update_json(self.state_file, apply, default=self._initial_state())
\ No newline at end of file
@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .anomaly_detector import AnomalyDetector
+from .anomaly_store import AnomalyStore
+from .log_batch import LogBatch, to_utc
+from .log_reader import LogReader
+from .logging_setup import get_logger
+from .metrics import timed
+
+logger = get_logger(__name__)
+
+# Detector of the current pool worker process, loaded once by _init_worker
+_worker_detector: Optional[AnomalyDetector] = None
+
+
+def _init_worker(model_blob: bytes, detector_settings: Dict):
+    global _worker_detector
+    # One scoring thread per process; the pool already uses every core
+    _worker_detector = AnomalyDetector(max_workers=1, **detector_settings)
+    _worker_detector.load_model(model_blob)
+
+
+def _detect_partition(partition_start: float, frame: pd.DataFrame) -> Tuple[float, int, List[Dict]]:
+    return partition_start, len(frame), _worker_detector.detect(LogBatch(frame), refit=False)
+
+
+def default_run_id(start: datetime, end: datetime, partition_minutes: int) -> str:
+    return f"{to_utc(start):%Y%m%dT%H%M}-{to_utc(end):%Y%m%dT%H%M}-{partition_minutes}m"
+
+
+def run_backfill(log_reader: LogReader, store: AnomalyStore, start: datetime, end: datetime,
+                 partition_minutes: int = 60, workers: Optional[int] = None, run_id: Optional[str] = None,
+                 restart: bool = False, model_blob: Optional[bytes] = None,
+                 detector_settings: Optional[Dict] = None,
+                 on_partition: Optional[Callable[[Dict, List[Dict]], None]] = None) -> Dict:
+    """Re-run detection over [start, end) of the CSV history
+
+    The range is split into `partition_minutes` partitions that are scored
+    on a process pool. Every worker uses the same models: `model_blob`
+    (e.g. the published shared model) topped up with models for any service
+    it lacks, fitted here on the whole range. `detector_settings` are
+    AnomalyDetector keyword arguments (contamination and per-service
+    overrides, see registry.anomaly_detector_settings); loaded models
+    fitted with other settings are refitted here too. Each finished partition's
+    anomalies are written to `store` together with its checkpoint, so an
+    interrupted run resumes with the partitions it had not finished.
+    `on_partition(progress, anomalies)` runs in this process after each
+    partition and is where callers opt in to LLM or scaling side effects.
+    """
+    start, end = to_utc(start), to_utc(end)
+    run_id = run_id or default_run_id(start, end, partition_minutes)
+    if restart:
+        store.reset_run(run_id)
+    done = store.completed_partitions(run_id)
+
+    started = time.perf_counter()
+    logs = log_reader.read_range(start, end)
+    summary = {"run_id": run_id, "partitions": 0, "skipped": 0, "rows": 0, "anomalies": 0}
+    if not logs:
+        return {**summary, "seconds": time.perf_counter() - started, "rows_per_sec": 0.0}
+
+    keys = logs.frame["timestamp"].dt.floor(f"{partition_minutes}min")
+    partitions = {}
+    for key, positions in keys.groupby(keys, sort=True).indices.items():
+        partition_start = pd.Timestamp(key).timestamp()
+        if partition_start in done:
+            summary["skipped"] += 1
+        else:
+            partitions[partition_start] = positions
+    if not partitions:
+        return {**summary, "seconds": time.perf_counter() - started, "rows_per_sec": 0.0}
+
+    # Fit once here so every partition is scored by the same models
+    detector_settings = detector_settings or {}
+    detector = AnomalyDetector(**detector_settings)
+    if model_blob:
+        detector.load_model(model_blob)
+    with timed("backfill_fit"):
+        detector.fit(logs, only_missing=True)
+    model_blob = detector.export_model()
+
+    workers = workers or os.cpu_count() or 1
+    # spawn: the parent runs logging and thread pools, which don't survive fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_blob, detector_settings)) as pool:
+        futures = [pool.submit(_detect_partition, partition_start, logs.frame.iloc[positions])
+                   for partition_start, positions in partitions.items()]
+        for future in as_completed(futures):
+            partition_start, rows, anomalies = future.result()
+            store.complete_partition(run_id, partition_start, rows, anomalies)
+
+            summary["partitions"] += 1
+            summary["rows"] += rows
+            summary["anomalies"] += len(anomalies)
+            elapsed = time.perf_counter() - started
+            progress = {
+                **summary,
+                "partition_start": datetime.fromtimestamp(partition_start, tz=timezone.utc).isoformat(),
+                "remaining": len(partitions) - summary["partitions"],
+                "rows_per_sec": summary["rows"] / elapsed if elapsed else 0.0,
+            }
+            logger.info("Backfill partition done", extra=progress)
+            if on_partition:
+                on_partition(progress, anomalies)
+
+    store.analyze()
+    elapsed = time.perf_counter() - started
+    return {**summary, "seconds": elapsed, "rows_per_sec": summary["rows"] / elapsed if elapsed else 0.0}
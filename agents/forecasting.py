@@ -0,0 +1,60 @@
+from typing import Optional
+
+import numpy as np
+
+# Smoothing and forecasts run on a (series x time) matrix: one row per
+# service, one column per minute. The recursions step through time once and
+# update every series together, so cost is O(minutes) numpy operations
+# regardless of how many services there are.
+
+
+def ewma(values: np.ndarray, alpha: float = 0.3) -> np.ndarray:
+    """Exponentially weighted moving average of each row, same shape as values"""
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    smoothed = np.empty_like(values)
+    if values.shape[1] == 0:
+        return smoothed
+    smoothed[:, 0] = values[:, 0]
+    for t in range(1, values.shape[1]):
+        smoothed[:, t] = alpha * values[:, t] + (1 - alpha) * smoothed[:, t - 1]
+    return smoothed
+
+
+def holt_winters(values: np.ndarray, horizon: int, alpha: float = 0.3, beta: float = 0.1,
+                 gamma: float = 0.1, season: Optional[int] = None) -> np.ndarray:
+    """Forecast the next `horizon` steps of each row with additive Holt-Winters
+
+    Without a season (or with fewer than two seasons of history) this is
+    Holt's linear trend method. Returns a (series x horizon) array clipped at 0.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_series, n_steps = values.shape
+    if n_steps == 0:
+        return np.zeros((n_series, horizon))
+    if n_steps == 1:
+        return np.repeat(values, horizon, axis=1)
+
+    seasonal = season is not None and season > 1 and n_steps >= 2 * season
+    if seasonal:
+        level = values[:, :season].mean(axis=1)
+        trend = (values[:, season:2 * season].mean(axis=1) - level) / season
+        seasons = values[:, :season] - level[:, None]
+        start = season
+    else:
+        level = values[:, 0].copy()
+        trend = values[:, 1] - values[:, 0]
+        seasons = np.zeros((n_series, 1))
+        start = 1
+
+    for t in range(start, n_steps):
+        s = t % seasons.shape[1]
+        previous_level = level
+        level = alpha * (values[:, t] - seasons[:, s]) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        if seasonal:
+            seasons[:, s] = gamma * (values[:, t] - level) + (1 - gamma) * seasons[:, s]
+
+    steps = np.arange(1, horizon + 1)
+    season_index = (n_steps + steps - 1) % seasons.shape[1]
+    forecast = level[:, None] + trend[:, None] * steps[None, :] + seasons[:, season_index]
+    return np.clip(forecast, 0, None)
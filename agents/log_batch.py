@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality string columns stored as pandas categoricals: each distinct
+# value is kept once and rows hold small integer codes. The unit-suffixed
+# metrics ("143ms", "85%") repeat heavily too, and are parsed once per category.
+CATEGORY_COLUMNS = ["level", "service", "error_code", "query_type", "affected_tables", "action",
+                    "response_time", "execution_time", "memory_usage"]
+CSV_DTYPES = {column: "category" for column in CATEGORY_COLUMNS}
+NUMBER_PATTERN = r'(\d+(?:\.\d+)?)'
+
+
+def extract_number(series: pd.Series) -> pd.Series:
+    """First number in each value ("85%" -> 85.0, "120ms" -> 120.0), 0 when missing"""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float).fillna(0)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Parse each distinct value once and broadcast through the codes
+        parsed = extract_number(pd.Series(series.cat.categories.astype(str)))
+        values = np.append(parsed.to_numpy(), 0.0)
+        return pd.Series(values[series.cat.codes.to_numpy()], index=series.index)
+    extracted = series.astype('string').str.extract(NUMBER_PATTERN, expand=False)
+    return pd.to_numeric(extracted, errors='coerce').fillna(0).astype(float)
+
+
+def to_utc(moment: datetime) -> pd.Timestamp:
+    """Timestamp in UTC; naive values are taken to be UTC already"""
+    moment = pd.Timestamp(moment)
+    return moment.tz_localize(timezone.utc) if moment.tzinfo is None else moment.tz_convert(timezone.utc)
+
+
+def utc_series(timestamps: pd.Series) -> pd.Series:
+    """Column version of to_utc()"""
+    return timestamps.dt.tz_localize("UTC") if timestamps.dt.tz is None else timestamps.dt.tz_convert("UTC")
+
+
+class LogBatch:
+    """Columnar batch of log rows passed from LogReader to AnomalyDetector and the API
+
+    Rows stay in one DataFrame with categorical service/level columns and a
+    datetime64 timestamp column, instead of one dict per row. Dicts are only
+    built by records() for the rows that are actually returned to clients.
+    """
+    __slots__ = ("frame",)
+
+    def __init__(self, frame: Optional[pd.DataFrame] = None):
+        self.frame = frame if frame is not None else pd.DataFrame(columns=["timestamp"])
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "LogBatch":
+        """Normalize dtypes of a freshly read or concatenated frame"""
+        frame = frame.reset_index(drop=True)
+        if "timestamp" in frame.columns and not pd.api.types.is_datetime64_any_dtype(frame["timestamp"]):
+            frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601")
+        for column in CATEGORY_COLUMNS:
+            if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype("category")
+        return cls(frame)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict]) -> "LogBatch":
+        return cls.from_frame(pd.DataFrame(list(records)))
+
+    @classmethod
+    def concat(cls, frames: Iterable[pd.DataFrame]) -> "LogBatch":
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return cls()
+        if len(frames) == 1:
+            return cls.from_frame(frames[0])
+        # Categories differ between files, so concat yields object columns; re-intern them
+        return cls.from_frame(pd.concat(frames, ignore_index=True))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __bool__(self) -> bool:
+        return len(self.frame) > 0
+
+    def take(self, positions) -> "LogBatch":
+        return LogBatch(self.frame.iloc[positions].reset_index(drop=True))
+
+    def numeric(self, column: str) -> pd.Series:
+        """Column parsed to floats, e.g. response_time "143ms" -> 143.0 (0 when missing)"""
+        if column not in self.frame.columns:
+            return pd.Series(0.0, index=self.frame.index)
+        return extract_number(self.frame[column])
+
+    def max_timestamp(self):
+        return self.frame["timestamp"].max() if len(self.frame) else None
+
+    def records(self, positions: Optional[Sequence[int]] = None) -> List[Dict]:
+        """Materialize rows as JSON-ready dicts (NaN -> None, timestamps as ISO strings)"""
+        frame = self.frame if positions is None else self.frame.iloc[np.asarray(positions, dtype=int)]
+        if frame.empty:
+            return []
+        frame = frame.astype(object)
+        if "timestamp" in frame.columns:
+            frame["timestamp"] = [ts.isoformat() if hasattr(ts, "isoformat") else ts
+                                  for ts in frame["timestamp"]]
+        frame = frame.where(frame.notna(), None)
+        return frame.to_dict("records")
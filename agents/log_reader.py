@@ -1,92 +1,193 @@
+import io
 import pandas as pd
 from pathlib import Path
-import json
-from typing import Dict, List
+from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
+from .metrics import ROWS_INGESTED, timed
+from .log_batch import CSV_DTYPES, LogBatch, to_utc, utc_series
+from .logging_setup import get_logger
+from .state_store import StateBackend, file_lock, update_json, write_json_atomic
+
+logger = get_logger(__name__)
 
 class LogReader:
-    def __init__(self, log_dir: str = "./logs"):
+    CURSOR_KEY = "log_reader.last_read_time"
+
+    def __init__(self, log_dir: str = "./logs", state_backend: Optional[StateBackend] = None):
         self.log_dir = Path(log_dir)
         self.cache_file = self.log_dir / "log_cache.json"
-        self.last_read_time = None
+        # With a backend the read cursor is shared by every worker; without
+        # one it lives on the instance as before
+        self.state_backend = state_backend
+        self._last_read_time = None
         self._initialize_cache()
 
+    @property
+    def last_read_time(self):
+        if self.state_backend is None:
+            return self._last_read_time
+        value = self.state_backend.get(self.CURSOR_KEY)
+        return pd.Timestamp(value) if value else None
+
+    @last_read_time.setter
+    def last_read_time(self, value):
+        if self.state_backend is None:
+            self._last_read_time = value
+        else:
+            self.state_backend.set(self.CURSOR_KEY, value.isoformat() if value is not None else None)
+
     def _initialize_cache(self):
-        if not self.cache_file.exists():
-            with open(self.cache_file, 'w') as f:
-                json.dump({"last_position": 0, "known_anomalies": []}, f)
+        with file_lock(self.cache_file):
+            if not self.cache_file.exists():
+                write_json_atomic(self.cache_file, {"last_position": 0, "known_anomalies": []}, indent=None)
+
+    def _read_csv(self, log_file) -> pd.DataFrame:
+        df = pd.read_csv(log_file, on_bad_lines='skip', dtype=CSV_DTYPES)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        return df
+
+    def read_appended_logs(self, offsets: Dict[str, int]) -> Tuple[LogBatch, Dict[str, int]]:
+        """Read only the rows appended to each CSV since the given byte offsets
+
+        Returns the new rows and the updated offsets. Only complete lines are
+        consumed, so a row still being written is picked up on the next call.
+        A file that shrank is treated as rotated and read from the start.
+        """
+        frames = []
+        new_offsets = dict(offsets)
+        try:
+            with timed("log_read_appended"):
+                for log_file in self.log_dir.glob("*.csv"):
+                    size = log_file.stat().st_size
+                    offset = offsets.get(log_file.name, 0)
+                    if size < offset:
+                        offset = 0
+                    if size == offset:
+                        continue
+
+                    with open(log_file, 'rb') as f:
+                        header = f.readline()
+                        offset = max(offset, len(header))
+                        f.seek(offset)
+                        data = f.read()
 
-    def get_recent_logs(self, minutes: int = 5) -> List[Dict]:
+                    end = data.rfind(b"\n") + 1
+                    if end == 0:
+                        continue
+                    df = self._read_csv(io.BytesIO(header + data[:end]))
+                    if not df.empty:
+                        frames.append(df)
+                    new_offsets[log_file.name] = offset + end
+
+            batch = LogBatch.concat(frames)
+            ROWS_INGESTED.inc(len(batch), source="appended")
+            return batch, new_offsets
+        except Exception as e:
+            logger.exception("Error reading appended logs: %s", e)
+            return LogBatch(), offsets
+
+    def get_recent_logs(self, minutes: int = 5) -> LogBatch:
         """Get logs from the last N minutes of available data"""
         try:
-            all_logs = []
-            for log_file in self.log_dir.glob("*.csv"):
-                if log_file.name == "log_cache.json":
-                    continue
-                    
-                df = pd.read_csv(log_file, on_bad_lines='skip')
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                
-                if df.empty:
-                    continue
-                
-                # Use the latest timestamp in the logs as reference
-                latest_time = df['timestamp'].max()
-                cutoff_time = latest_time - timedelta(minutes=minutes)
-                
-                recent_logs = df[df['timestamp'] > cutoff_time]
-                
-                if not recent_logs.empty:
-                    all_logs.extend(recent_logs.to_dict('records'))
-            
+            frames = []
+            with timed("log_read_recent"):
+                for log_file in self.log_dir.glob("*.csv"):
+                    if log_file.name == "log_cache.json":
+                        continue
+
+                    df = self._read_csv(log_file)
+
+                    if df.empty:
+                        continue
+
+                    # Use the latest timestamp in the logs as reference
+                    latest_time = df['timestamp'].max()
+                    cutoff_time = latest_time - timedelta(minutes=minutes)
+
+                    recent_logs = df[df['timestamp'] > cutoff_time]
+
+                    if not recent_logs.empty:
+                        frames.append(recent_logs)
+
+                all_logs = LogBatch.concat(frames)
+
+            ROWS_INGESTED.inc(len(all_logs), source="recent")
             return all_logs
         except Exception as e:
-            print(f"Error reading logs: {str(e)}")
-            return []
+            logger.exception("Error reading logs: %s", e)
+            return LogBatch()
+
+    def read_range(self, start: datetime, end: datetime) -> LogBatch:
+        """Get every log with start <= timestamp < end, regardless of the read cursor
+
+        Naive bounds and log timestamps are taken as UTC, and the returned
+        timestamps are all UTC. Unlike the live readers, errors propagate:
+        a backfill must not mistake an unreadable file for an empty range.
+        """
+        start, end = to_utc(start), to_utc(end)
+        frames = []
+        with timed("log_read_range"):
+            for log_file in self.log_dir.glob("*.csv"):
+                df = self._read_csv(log_file)
+                df['timestamp'] = utc_series(df['timestamp'])
+                in_range = df[(df['timestamp'] >= start) & (df['timestamp'] < end)]
+                if not in_range.empty:
+                    frames.append(in_range)
+
+            all_logs = LogBatch.concat(frames)
+
+        ROWS_INGESTED.inc(len(all_logs), source="range")
+        return all_logs
 
-    def read_new_logs(self, file_pattern: str = "*.csv") -> List[Dict]:
+    def read_new_logs(self, file_pattern: str = "*.csv") -> LogBatch:
         """Read new logs since last check"""
         try:
-            new_logs = []
-            for log_file in self.log_dir.glob(file_pattern):
-                if log_file.name == "log_cache.json":
-                    continue
-                    
-                df = pd.read_csv(log_file, on_bad_lines='skip')
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                
-                if df.empty:
-                    continue
-                
-                # If no last read time, use the earliest timestamp
-                if not self.last_read_time:
-                    self.last_read_time = df['timestamp'].min()
-                
-                new_records = df[df['timestamp'] > self.last_read_time]
-                if not new_records.empty:
-                    new_logs.extend(new_records.to_dict('records'))
-            
+            frames = []
+            # Read the cursor once; with a shared backend each access is a query
+            last_read_time = self.last_read_time
+            initial_read_time = last_read_time
+            with timed("log_read_new"):
+                for log_file in self.log_dir.glob(file_pattern):
+                    if log_file.name == "log_cache.json":
+                        continue
+
+                    df = self._read_csv(log_file)
+
+                    if df.empty:
+                        continue
+
+                    # If no last read time, use the earliest timestamp
+                    if not last_read_time:
+                        last_read_time = df['timestamp'].min()
+
+                    new_records = df[df['timestamp'] > last_read_time]
+                    if not new_records.empty:
+                        frames.append(new_records)
+
+                new_logs = LogBatch.concat(frames)
+
             if new_logs:
-                self.last_read_time = max(log['timestamp'] for log in new_logs)
-            
+                last_read_time = new_logs.max_timestamp()
+            if last_read_time != initial_read_time:
+                self.last_read_time = last_read_time
+
+            ROWS_INGESTED.inc(len(new_logs), source="new")
             return new_logs
         except Exception as e:
-            print(f"Error reading new logs: {str(e)}")
-            return []
+            logger.exception("Error reading new logs: %s", e)
+            return LogBatch()
 
     def mark_anomaly(self, log_entry: Dict):
         """Mark a log entry as an anomaly for future reference"""
         try:
-            with open(self.cache_file, 'r') as f:
-                cache = json.load(f)
-            
-            cache["known_anomalies"].append({
-                "timestamp": log_entry["timestamp"],
-                "service": log_entry["service"],
-                "message": log_entry["message"]
-            })
-            
-            with open(self.cache_file, 'w') as f:
-                json.dump(cache, f)
+            def append(cache: Dict) -> Dict:
+                cache["known_anomalies"].append({
+                    "timestamp": log_entry["timestamp"],
+                    "service": log_entry["service"],
+                    "message": log_entry["message"]
+                })
+                return cache
+
+            update_json(self.cache_file, append, indent=None)
         except Exception as e:
-            print(f"Error marking anomaly: {str(e)}")
\ No newline at end of file
+            logger.exception("Error marking anomaly: %s", e)
\ No newline at end of file
@@ -0,0 +1,146 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from .metrics import REGISTRY
+
+LOG_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+
+# Attributes every LogRecord carries; anything else came in through `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_log_queue: Optional[queue.Queue] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line, including `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through 1 in `rate` records logged with extra={"sampled": True}
+
+    Sampling is tracked per call site (logger name + message template) so a
+    noisy per-row message does not starve a rarer one.
+    """
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = max(1, rate)
+        self._counters: Dict[tuple, itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate == 1 or not getattr(record, "sampled", False):
+            return True
+        key = (record.name, record.msg)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full
+
+    Records are queued unformatted; the listener thread builds the message
+    and JSON. Only a traceback is rendered here, so the queued record does
+    not keep the exception's frames alive.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      sample_rate: Optional[int] = None, queue_size: Optional[int] = None):
+    """Route all platform logging through a background thread
+
+    Callers only pay for an in-memory enqueue; formatting and stdout writes
+    happen on the QueueListener thread. Settings default to the LOG_LEVEL,
+    LOG_FORMAT (json|text), LOG_SAMPLE_RATE and LOG_QUEUE_SIZE env vars.
+    """
+    global _listener, _log_queue
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "json")
+    sample_rate = sample_rate or int(os.getenv("LOG_SAMPLE_RATE", "100"))
+    queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(_log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger("observability")
+    root.setLevel(level)
+    root.handlers = [queue_handler]
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(_log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_queue_depth() -> int:
+    """Number of records waiting to be written"""
+    return _log_queue.qsize() if _log_queue is not None else 0
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the platform's `observability` namespace"""
+    return logging.getLogger(f"observability.{name}")
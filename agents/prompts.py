@@ -0,0 +1,102 @@
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Lower sorts first: CRITICAL anomalies get the token budget before WARNINGs
+SEVERITY_RANK = {"FATAL": 0, "CRITICAL": 0, "ERROR": 1, "WARNING": 2, "INFO": 3, "DEBUG": 4}
+# Completion tokens allowed per anomaly, passed to the API as max_tokens
+COMPLETION_TOKENS_PER_ANOMALY = 400
+
+REMEDIATION_SECTIONS = """Include in your response:
+1. Brief explanation of the issue
+2. Code snippets or commands to resolve the problem
+3. Configuration changes needed (if any)
+4. Verification steps with code examples
+5. Rollback steps if needed"""
+
+_DETAIL_FIELDS = [
+    ("Service", "service"),
+    ("Level", "level"),
+    ("Message", "message"),
+    ("Error Code", "error_code"),
+    ("CPU Usage", "cpu_usage"),
+    ("Memory Usage", "memory_usage"),
+    ("Response Time", "response_time"),
+    ("Execution Time", "execution_time"),
+]
+_MARKER = "=== ANOMALY {} ==="
+_MARKER_PATTERN = re.compile(r"^[#*\s]*=+\s*ANOMALY\s+(\d+)\s*=+[*\s]*$", re.MULTILINE | re.IGNORECASE)
+
+
+def severity_rank(anomaly: Dict) -> int:
+    return SEVERITY_RANK.get(str(anomaly.get("level", "")).upper(), len(SEVERITY_RANK))
+
+
+def priority_key(anomaly: Dict) -> Tuple[int, float]:
+    """Sort key: most severe first, then the most anomalous score"""
+    return severity_rank(anomaly), -float(anomaly.get("anomaly_score") or 0.0)
+
+
+def describe_anomaly(anomaly: Dict) -> str:
+    """The anomaly's fields as prompt lines, skipping ones that are empty for its service"""
+    lines = []
+    for label, key in _DETAIL_FIELDS:
+        value = anomaly.get(key)
+        if value is not None and value != "" and value == value:
+            lines.append(f"{label}: {value}")
+    return "\n".join(lines)
+
+
+def anomaly_prompt(anomaly: Dict) -> str:
+    """One request covering both the remediation steps and the code-focused fix"""
+    return f"""Please provide a detailed remediation solution with code examples for this system anomaly:
+{describe_anomaly(anomaly)}
+
+{REMEDIATION_SECTIONS}"""
+
+
+def batch_prompt(anomalies: Sequence[Dict]) -> str:
+    """One request for several related anomalies; split the answer with split_batch_response"""
+    if len(anomalies) == 1:
+        return anomaly_prompt(anomalies[0])
+    items = "\n\n".join(f"{_MARKER.format(i)}\n{describe_anomaly(anomaly)}"
+                        for i, anomaly in enumerate(anomalies, start=1))
+    return f"""Please provide a detailed remediation solution with code examples for each of the following {len(anomalies)} related system anomalies.
+
+{REMEDIATION_SECTIONS}
+
+Answer each anomaly separately. Start each answer with its marker line exactly as given (for example "{_MARKER.format(1)}") and write nothing before the first marker.
+
+{items}"""
+
+
+def split_batch_response(response: str, count: int) -> List[Optional[str]]:
+    """Per-anomaly answers from a batched response; None where an answer is missing"""
+    if count == 1:
+        return [response]
+    answers: List[Optional[str]] = [None] * count
+    matches = list(_MARKER_PATTERN.finditer(response or ""))
+    for match, following in zip(matches, matches[1:] + [None]):
+        index = int(match.group(1)) - 1
+        end = following.start() if following else len(response)
+        answer = response[match.end():end].strip()
+        if 0 <= index < count and answer:
+            answers[index] = answer
+    return answers
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def plan_batches(anomalies: Sequence[Dict], max_batch: int) -> List[List[Dict]]:
+    """Group related anomalies (same service and severity) into batches, highest priority first"""
+    groups: Dict[Tuple[str, int], List[Dict]] = {}
+    for anomaly in sorted(anomalies, key=priority_key):
+        key = (str(anomaly.get("service")), severity_rank(anomaly))
+        groups.setdefault(key, []).append(anomaly)
+
+    batches = [group[start:start + max_batch]
+               for group in groups.values()
+               for start in range(0, len(group), max_batch)]
+    return sorted(batches, key=lambda batch: priority_key(batch[0]))
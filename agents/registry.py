@@ -0,0 +1,153 @@
+import functools
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .logging_setup import get_logger
+from .state_store import get_state_backend
+
+# Agent settings below come from the environment
+load_dotenv()
+
+logger = get_logger(__name__)
+
+# Opt-in: adds per-minute error rate and p95 latency to the model features
+ROLLUP_FEATURES_ENABLED = os.getenv("ROLLUP_FEATURES", "0") == "1"
+# Shared anomaly model published by main.detect_anomalies for every worker
+MODEL_BLOB_KEY = "anomaly_detector.model"
+MODEL_VERSION_KEY = "anomaly_detector.model_version"
+# Libraries worth reporting on: they dominate import time when loaded
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "pyod", "numba", "openai"]
+
+_instances: Dict[str, object] = {}
+_init_seconds: Dict[str, float] = {}
+_lock = threading.RLock()
+
+
+def singleton(factory: Callable):
+    """Build the object on first call and return the same one afterwards
+
+    The agents import pandas/pyod/openai inside their factories, so a
+    process only pays for the libraries it actually uses. Construction time
+    is recorded for startup_report().
+    """
+    name = factory.__name__[len("get_"):] if factory.__name__.startswith("get_") else factory.__name__
+
+    @functools.wraps(factory)
+    def get():
+        instance = _instances.get(name)
+        if instance is None:
+            with _lock:
+                instance = _instances.get(name)
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = _instances[name] = factory()
+                    _init_seconds[name] = time.perf_counter() - start
+                    logger.info("Initialized %s", name, extra={"duration_s": round(_init_seconds[name], 3)})
+        return instance
+
+    get.peek = lambda: _instances.get(name)
+    return get
+
+
+@singleton
+def get_log_reader():
+    from .log_reader import LogReader
+    return LogReader("./logs", state_backend=get_state_backend())
+
+
+@singleton
+def get_rollup_engine():
+    from .rollups import RollupEngine
+    return RollupEngine(get_log_reader(), "./state/rollups")
+
+
+def parse_contamination(value: str) -> float:
+    """A contamination setting as pyod accepts it: a number in (0, 0.5]"""
+    try:
+        contamination = float(value)
+    except ValueError:
+        raise ValueError(f"contamination {value!r} is not a number")
+    if not 0 < contamination <= 0.5:
+        raise ValueError(f"contamination {value!r} is outside (0, 0.5]")
+    return contamination
+
+
+def parse_service_contamination(value: str) -> Dict[str, float]:
+    """SERVICE_CONTAMINATION as a dict, e.g. "database=0.05,auth-service=0.02"
+
+    Malformed entries are logged and skipped, so a typo leaves that service
+    on the default instead of failing every detection request.
+    """
+    settings = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        service, separator, contamination = (part.strip() for part in item.partition("="))
+        try:
+            if not separator or not service:
+                raise ValueError("expected service=contamination")
+            settings[service] = parse_contamination(contamination)
+        except ValueError as e:
+            logger.error("Ignoring SERVICE_CONTAMINATION entry %r: %s", item, e)
+    return settings
+
+
+def anomaly_detector_settings() -> Dict:
+    """AnomalyDetector keyword arguments from ANOMALY_CONTAMINATION and SERVICE_CONTAMINATION"""
+    try:
+        contamination = parse_contamination(os.getenv("ANOMALY_CONTAMINATION", "0.1"))
+    except ValueError as e:
+        logger.error("Ignoring ANOMALY_CONTAMINATION: %s; using 0.1", e)
+        contamination = 0.1
+    return {"contamination": contamination,
+            "service_contamination": parse_service_contamination(os.getenv("SERVICE_CONTAMINATION", ""))}
+
+
+@singleton
+def get_anomaly_detector():
+    from .anomaly_detector import AnomalyDetector
+    return AnomalyDetector(**anomaly_detector_settings(),
+                           rollups=get_rollup_engine() if ROLLUP_FEATURES_ENABLED else None)
+
+
+@singleton
+def get_remediator():
+    from .remediator import RemediationAgent
+    return RemediationAgent(tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "20000")),
+                            batch_size=int(os.getenv("LLM_BATCH_SIZE", "5")),
+                            state_backend=get_state_backend(),
+                            max_deferred=int(os.getenv("LLM_MAX_DEFERRED", "1000")))
+
+
+@singleton
+def get_auto_scaler():
+    from .auto_scaler import AutoScaler
+    return AutoScaler()
+
+
+@singleton
+def get_anomaly_store():
+    from .anomaly_store import AnomalyStore
+    return AnomalyStore(os.getenv("ANOMALY_DB", "./state/anomalies.db"))
+
+
+def preload(names: Optional[List[str]] = None):
+    """Construct agents ahead of the first request (e.g. from a background thread)"""
+    factories = {"log_reader": get_log_reader, "rollup_engine": get_rollup_engine,
+                 "anomaly_detector": get_anomaly_detector, "remediator": get_remediator,
+                 "auto_scaler": get_auto_scaler, "anomaly_store": get_anomaly_store}
+    for name in names or factories:
+        factories[name]()
+
+
+def startup_report() -> Dict:
+    """Seconds spent constructing each agent so far, and which heavy libraries are loaded"""
+    with _lock:
+        initialized = {name: round(seconds, 4) for name, seconds in _init_seconds.items()}
+    return {
+        "agents_initialized": initialized,
+        "heavy_modules_loaded": [module for module in HEAVY_MODULES if module in sys.modules],
+    }
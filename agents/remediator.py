@@ -1,61 +1,164 @@
-from typing import Dict, List
-import json
+import asyncio
+import threading
+import uuid
+from typing import Dict, List, Optional
 from pathlib import Path
-from .utils import call_openai
+from .utils import TokenBudget, call_openai
+from .metrics import LLM_DEFERRED, QUEUE_DEPTH
+from .prompts import (
+    COMPLETION_TOKENS_PER_ANOMALY, anomaly_prompt, batch_prompt, estimate_tokens, plan_batches,
+    priority_key, split_batch_response
+)
+from .logging_setup import get_logger
+from .state_store import StateBackend, file_lock, read_json, update_json, write_json_atomic
+
+logger = get_logger(__name__)
 
 class RemediationAgent:
-    def __init__(self, state_dir: str = "./state"):
+    def __init__(self, state_dir: str = "./state", tokens_per_minute: int = 20000, batch_size: int = 5,
+                 state_backend: Optional[StateBackend] = None, max_deferred: int = 1000):
         self.state_dir = Path(state_dir)
+        self.budget = TokenBudget(tokens_per_minute, backend=state_backend)
+        self.batch_size = batch_size
+        self.max_deferred = max_deferred
+        # Anomalies waiting for token budget, most severe first; never written to history
+        self._deferred: List[Dict] = []
+        self._deferred_lock = threading.Lock()
         self.state_dir.mkdir(exist_ok=True)
         self.history_file = self.state_dir / "remediation_history.json"
         self._initialize_history()
     
     def _initialize_history(self):
         """Initialize or load remediation history"""
-        if not self.history_file.exists():
-            with open(self.history_file, 'w') as f:
-                json.dump([], f)
+        with file_lock(self.history_file):
+            if not self.history_file.exists():
+                write_json_atomic(self.history_file, [])
+
+    @property
+    def deferred_count(self) -> int:
+        """Anomalies queued until the token budget frees up"""
+        return len(self._deferred)
     
     async def suggest_remediation(self, anomaly: Dict) -> Dict:
-        """Generate remediation suggestions using Groq LLM"""
-        prompt = f"""Given the following system anomaly, suggest specific remediation steps:
-        Service: {anomaly['service']}
-        Level: {anomaly['level']}
-        Message: {anomaly['message']}
-        CPU Usage: {anomaly.get('cpu_usage', 'N/A')}
-        Memory Usage: {anomaly.get('memory_usage', 'N/A')}
-        Response Time: {anomaly.get('response_time', 'N/A')}
-        
-        Provide specific commands or configuration changes that could resolve the issue.
+        """Generate a remediation suggestion for one anomaly"""
+        loop = asyncio.get_event_loop()
+        remediations = await loop.run_in_executor(None, self.suggest_remediations, [anomaly])
+        return remediations[0]
+
+    def suggest_remediations(self, anomalies: List[Dict]) -> List[Dict]:
+        """Remediation suggestions for many anomalies in as few LLM requests as possible
+
+        Related anomalies are sent together in one structured request and the
+        answer is split back out per anomaly. Batches go in severity order
+        against the per-minute token budget, together with anomalies deferred
+        by earlier calls. Once the budget runs out the rest are queued in
+        memory (up to max_deferred, most severe kept) for a later call; call
+        with no anomalies to just drain the queue.
+
+        Returns one remediation per entry of `anomalies`, in order (status
+        "deferred" for queued ones), followed by those for earlier deferred
+        anomalies that were answered now. Deferred entries are not saved to
+        the history.
         """
-        
-        suggestion = await call_openai(prompt)
-        
-        remediation = {
-            "anomaly": anomaly,
-            "suggested_action": suggestion,
-            "status": "pending"
-        }
-        
-        # Save to history
-        self._save_to_history(remediation)
-        
-        return remediation
-    
+        with self._deferred_lock:
+            queued, self._deferred = self._deferred, []
+        if not anomalies and not queued:
+            return []
+
+        outcomes: Dict[int, Dict] = {}
+        deferred: List[Dict] = []
+        for batch in plan_batches(queued + list(anomalies), self.batch_size):
+            if deferred:
+                deferred.extend(batch)
+                continue
+            sent = self._reserve(batch)
+            deferred.extend(batch[len(sent):])
+            if sent:
+                outcomes.update(self._send(sent))
+
+        deferred_ids = {id(anomaly) for anomaly in deferred}
+        queued_ids = {id(anomaly) for anomaly in queued}
+        remediations = []
+        for anomaly in list(anomalies) + [anomaly for anomaly in queued if id(anomaly) not in deferred_ids]:
+            key = id(anomaly)
+            remediation = {
+                "anomaly": anomaly,
+                "query": anomaly_prompt(anomaly),
+                "suggested_action": None,
+                "status": "pending",
+                **outcomes.get(key, {}),
+            }
+            if key in deferred_ids:
+                remediation["status"] = "deferred"
+                if key not in queued_ids:
+                    LLM_DEFERRED.inc(level=str(anomaly.get("level", "unknown")))
+            elif remediation["suggested_action"] is None:
+                remediation["status"] = "failed"
+                remediation.setdefault("error", "No answer for this anomaly in the LLM response")
+            remediations.append(remediation)
+
+        self._save_many([remediation for remediation in remediations if remediation["status"] != "deferred"])
+        self._requeue(deferred)
+        return remediations
+
+    def _requeue(self, deferred: List[Dict]):
+        with self._deferred_lock:
+            self._deferred = sorted(self._deferred + deferred, key=priority_key)
+            dropped = len(self._deferred) - self.max_deferred
+            del self._deferred[self.max_deferred:]
+            QUEUE_DEPTH.set(len(self._deferred), queue="llm_deferred")
+        if deferred:
+            logger.warning("Token budget exhausted; %d anomalies waiting for budget", len(self._deferred))
+        if dropped > 0:
+            logger.warning("Deferred queue full; dropped %d lowest-priority anomalies", dropped)
+
+    def _reserve(self, batch: List[Dict]) -> List[Dict]:
+        """Reserve budget for the longest prefix of `batch` that fits; returns that prefix"""
+        for size in range(len(batch), 0, -1):
+            tokens = estimate_tokens(batch_prompt(batch[:size])) + COMPLETION_TOKENS_PER_ANOMALY * size
+            if self.budget.try_reserve(tokens):
+                return batch[:size]
+        return []
+
+    def _send(self, batch: List[Dict]) -> Dict[int, Dict]:
+        """Request one batch; per anomaly, the prompt that was sent and the answer or error"""
+        prompt = batch_prompt(batch)
+        sent = {"query": prompt}
+        if len(batch) > 1:
+            # Every anomaly of a batch stores the same prompt; batch_id ties them together
+            sent["batch_id"] = uuid.uuid4().hex[:12]
+        try:
+            answers = self._request(prompt, len(batch))
+        except Exception as e:
+            logger.exception("Error requesting remediation for %d anomalies: %s", len(batch), e)
+            return {id(anomaly): {**sent, "error": str(e)} for anomaly in batch}
+
+        outcomes = {}
+        for anomaly, answer in zip(batch, answers):
+            outcomes[id(anomaly)] = {**sent, "suggested_action": answer}
+            # A batch answer the model did not mark up is retried on its own
+            if answer is None and len(batch) > 1 and self._reserve([anomaly]):
+                outcomes[id(anomaly)] = self._send([anomaly])[id(anomaly)]
+        return outcomes
+
+    def _request(self, prompt: str, count: int) -> List[Optional[str]]:
+        response = call_openai(prompt, max_tokens=COMPLETION_TOKENS_PER_ANOMALY * count)
+        return split_batch_response(response, count)
+
     def _save_to_history(self, remediation: Dict):
         """Save remediation action to history"""
-        with open(self.history_file, 'r') as f:
-            history = json.load(f)
-        
-        history.append(remediation)
-        
-        with open(self.history_file, 'w') as f:
-            json.dump(history, f, indent=2)
+        self._save_many([remediation])
+
+    def _save_many(self, remediations: List[Dict]):
+        def append(history: List[Dict]) -> List[Dict]:
+            history.extend(remediations)
+            return history
+
+        update_json(self.history_file, append, default=[])
     
     def get_history(self) -> List[Dict]:
         """Get remediation action history"""
-        with open(self.history_file, 'r') as f:
-            return json.load(f)
+        return read_json(self.history_file, default=[])
     
     def mark_remediation_status(self, anomaly_timestamp: str, status: str):
         """Update the status of a remediation attempt"""
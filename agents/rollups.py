@@ -0,0 +1,289 @@
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .log_batch import LogBatch
+from .log_reader import LogReader
+from .metrics import timed
+from .logging_setup import get_logger
+from .state_store import read_json, update_json
+
+logger = get_logger(__name__)
+
+# Log-bucketed quantile sketch: relative error of about (gamma - 1) / 2
+SKETCH_GAMMA = 1.04
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+LATENCY_COLUMNS = ["response_time", "execution_time"]
+ERROR_LEVELS = ("ERROR", "CRITICAL", "FATAL")
+_EPOCH = pd.Timestamp(0, tz="UTC")
+
+
+def sketch_quantile(sketch: Dict[int, int], q: float) -> Optional[float]:
+    """Approximate q-quantile of the values counted in a bucket sketch"""
+    total = sum(sketch.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for index in sorted(sketch):
+        seen += sketch[index]
+        if seen > rank:
+            return 2 * SKETCH_GAMMA ** index / (SKETCH_GAMMA + 1)
+    return None
+
+
+def _new_rollup() -> Dict:
+    return {"count": 0, "levels": {}, "response_time": {}, "execution_time": {},
+            "cpu_max": 0.0, "memory_max": 0.0}
+
+
+def _minute_iso(minute: int) -> str:
+    return datetime.fromtimestamp(minute * 60, tz=timezone.utc).isoformat()
+
+
+def _to_json(rollup: Dict) -> Dict:
+    # JSON object keys must be strings
+    return {**rollup, **{column: {str(k): v for k, v in rollup[column].items()} for column in LATENCY_COLUMNS}}
+
+
+def _from_json(rollup: Dict) -> Dict:
+    return {**rollup, **{column: {int(k): v for k, v in rollup[column].items()} for column in LATENCY_COLUMNS}}
+
+
+class RollupEngine:
+    """Incremental per-service, per-minute aggregates of the log stream
+
+    Each refresh() pulls only the rows appended to the CSVs since the last
+    call (via LogReader.read_appended_logs) and folds them into per-minute
+    rollups: counts by level, quantile sketches for response_time and
+    execution_time, and max CPU/memory. The last `retention_minutes` live in
+    memory; every touched minute is also written to hourly JSON segments
+    under `segment_dir`, so history survives restarts and older ranges can
+    still be queried. Minutes are keyed by UTC epoch minute.
+    """
+
+    def __init__(self, log_reader: LogReader, segment_dir: str = "./state/rollups",
+                 retention_minutes: int = 24 * 60):
+        self.log_reader = log_reader
+        self.segment_dir = Path(segment_dir)
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        self.offsets_file = self.segment_dir / "offsets.json"
+        self.retention_minutes = retention_minutes
+        self._rollups: Dict[str, Dict[int, Dict]] = defaultdict(dict)
+        self._dirty = set()
+        self._latest_minute: Optional[int] = None
+        self._lock = threading.RLock()
+        self._offsets = read_json(self.offsets_file, default={})
+        self._load_recent_segments()
+
+    # Ingest
+
+    def refresh(self) -> int:
+        """Fold newly appended log rows into the rollups; returns rows ingested"""
+        with self._lock:
+            batch, offsets = self.log_reader.read_appended_logs(self._offsets)
+            if batch:
+                self.ingest(batch)
+            self._offsets = offsets
+            self._flush()
+            self._evict()
+            return len(batch)
+
+    def ingest(self, batch: LogBatch):
+        """Add a batch of rows to the per-minute rollups"""
+        if not batch:
+            return
+        with self._lock, timed("rollup_ingest"):
+            df = batch.frame
+            timestamps = df["timestamp"]
+            if timestamps.dt.tz is None:
+                timestamps = timestamps.dt.tz_localize("UTC")
+            minute = ((timestamps - _EPOCH) // pd.Timedelta(minutes=1)).to_numpy()
+            service = df["service"].astype(str).to_numpy()
+            level = df["level"].astype(str).to_numpy()
+
+            keys = pd.DataFrame({"service": service, "minute": minute})
+            for (svc, m, lvl), n in keys.assign(level=level).groupby(
+                    ["service", "minute", "level"], sort=False).size().items():
+                rollup = self._rollup(svc, m)
+                rollup["count"] += int(n)
+                rollup["levels"][lvl] = rollup["levels"].get(lvl, 0) + int(n)
+
+            maxima = keys.assign(cpu=batch.numeric("cpu_usage").to_numpy(),
+                                 memory=batch.numeric("memory_usage").to_numpy())
+            for (svc, m), row in maxima.groupby(["service", "minute"], sort=False).max().iterrows():
+                rollup = self._rollup(svc, m)
+                rollup["cpu_max"] = max(rollup["cpu_max"], float(row["cpu"]))
+                rollup["memory_max"] = max(rollup["memory_max"], float(row["memory"]))
+
+            for column in LATENCY_COLUMNS:
+                values = batch.numeric(column).to_numpy()
+                present = values > 0
+                if not present.any():
+                    continue
+                buckets = keys[present].assign(
+                    bucket=np.ceil(np.log(values[present]) / _LOG_GAMMA).astype(int))
+                for (svc, m, bucket), n in buckets.groupby(
+                        ["service", "minute", "bucket"], sort=False).size().items():
+                    sketch = self._rollup(svc, m)[column]
+                    sketch[int(bucket)] = sketch.get(int(bucket), 0) + int(n)
+
+            batch_latest = int(minute.max())
+            if self._latest_minute is None or batch_latest > self._latest_minute:
+                self._latest_minute = batch_latest
+
+    def _rollup(self, service: str, minute) -> Dict:
+        minute = int(minute)
+        self._dirty.add((service, minute))
+        rollup = self._rollups[service].get(minute)
+        if rollup is None:
+            rollup = self._rollups[service][minute] = _new_rollup()
+        return rollup
+
+    # Persistence
+
+    def _segment_path(self, hour: int) -> Path:
+        return self.segment_dir / f"{datetime.fromtimestamp(hour * 3600, tz=timezone.utc):%Y%m%dT%H}.json"
+
+    def _flush(self):
+        """Write touched minutes to their hourly segments, then the read offsets"""
+        if not self._dirty:
+            return
+        by_hour: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+        for service, minute in self._dirty:
+            by_hour[minute // 60].append((service, minute))
+
+        for hour, keys in by_hour.items():
+            def merge(segment: Dict) -> Dict:
+                for service, minute in keys:
+                    existing = segment.setdefault(service, {}).get(str(minute))
+                    rollup = self._rollups[service][minute]
+                    # Another worker may have written this minute from further along the log
+                    if existing is None or existing["count"] <= rollup["count"]:
+                        segment[service][str(minute)] = _to_json(rollup)
+                return segment
+            update_json(self._segment_path(hour), merge, default={}, indent=None)
+
+        offsets = self._offsets
+        update_json(self.offsets_file,
+                    lambda saved: {**saved, **{name: max(saved.get(name, 0), offset)
+                                               for name, offset in offsets.items()}},
+                    default={})
+        self._dirty.clear()
+
+    def _load_segment(self, path: Path) -> Dict[str, Dict[int, Dict]]:
+        segment = read_json(path, default={})
+        return {service: {int(minute): _from_json(rollup) for minute, rollup in minutes.items()}
+                for service, minutes in segment.items()}
+
+    def _load_recent_segments(self):
+        hours = math.ceil(self.retention_minutes / 60) + 1
+        for path in sorted(self.segment_dir.glob("*T*.json"))[-hours:]:
+            for service, minutes in self._load_segment(path).items():
+                self._rollups[service].update(minutes)
+                latest = max(minutes, default=None)
+                if latest is not None and (self._latest_minute is None or latest > self._latest_minute):
+                    self._latest_minute = latest
+        self._evict()
+
+    def _evict(self):
+        if self._latest_minute is None:
+            return
+        cutoff = self._latest_minute - self.retention_minutes
+        for minutes in self._rollups.values():
+            for minute in [m for m in minutes if m <= cutoff]:
+                del minutes[minute]
+
+    # Queries
+
+    def _range(self, start: int, end: int) -> Dict[str, Dict[int, Dict]]:
+        """Rollups for [start, end], reading older minutes from segments if needed"""
+        result: Dict[str, Dict[int, Dict]] = defaultdict(dict)
+        buffer_start = self._latest_minute - self.retention_minutes if self._latest_minute is not None else end
+        if start <= buffer_start:
+            for hour in range(start // 60, min(end, buffer_start) // 60 + 1):
+                path = self._segment_path(hour)
+                if path.exists():
+                    for service, minutes in self._load_segment(path).items():
+                        result[service].update({m: r for m, r in minutes.items() if start <= m <= end})
+        for service, minutes in self._rollups.items():
+            result[service].update({m: r for m, r in minutes.items() if start <= m <= end})
+        return result
+
+    def timeseries(self, service: Optional[str] = None, minutes: int = 60,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, List[Dict]]:
+        """Per-minute points per service
+
+        Without start/end, returns the last `minutes` minutes of available
+        data, matching how LogReader.get_recent_logs anchors on the latest log.
+        """
+        with self._lock:
+            if self._latest_minute is None:
+                return {}
+            end_minute = self._epoch_minute(end) if end else self._latest_minute
+            start_minute = self._epoch_minute(start) if start else end_minute - minutes + 1
+            return {
+                svc: [self._point(minute, rollup) for minute, rollup in sorted(by_minute.items())]
+                for svc, by_minute in sorted(self._range(start_minute, end_minute).items())
+                if by_minute and (service is None or svc == service)
+            }
+
+    def frame(self, minutes: Optional[int] = None) -> pd.DataFrame:
+        """Rollups as a DataFrame (one row per service and minute) for use as model features"""
+        columns = ["service", "minute", "count", "error_rate", "response_time_p95",
+                   "execution_time_p95", "cpu_max", "memory_max"]
+        with self._lock:
+            rows = []
+            cutoff = self._latest_minute - minutes if minutes and self._latest_minute is not None else None
+            for svc, by_minute in self._rollups.items():
+                for minute, rollup in by_minute.items():
+                    if cutoff is None or minute > cutoff:
+                        rows.append({"service": svc, "minute": minute, **self._point(minute, rollup)})
+        return pd.DataFrame(rows)[columns] if rows else pd.DataFrame(columns=columns)
+
+    def row_features(self, batch: LogBatch) -> pd.DataFrame:
+        """Each row's service/minute error rate and p95 latency, aligned to the batch"""
+        df = batch.frame
+        timestamps = df["timestamp"]
+        if timestamps.dt.tz is None:
+            timestamps = timestamps.dt.tz_localize("UTC")
+        keys = pd.DataFrame({"service": df["service"].astype(str).to_numpy(),
+                             "minute": ((timestamps - _EPOCH) // pd.Timedelta(minutes=1)).to_numpy()})
+        stats = self.frame()
+        if stats.empty:
+            return pd.DataFrame({"minute_error_rate": 0.0, "minute_latency_p95": 0.0}, index=df.index)
+        stats["minute_latency_p95"] = stats[["response_time_p95", "execution_time_p95"]].max(axis=1)
+        joined = keys.merge(stats[["service", "minute", "error_rate", "minute_latency_p95"]]
+                            .rename(columns={"error_rate": "minute_error_rate"}),
+                            on=["service", "minute"], how="left")
+        joined.index = df.index
+        return joined[["minute_error_rate", "minute_latency_p95"]].astype(float).fillna(0.0)
+
+    @staticmethod
+    def _epoch_minute(moment: datetime) -> int:
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() // 60)
+
+    @staticmethod
+    def _point(minute: int, rollup: Dict) -> Dict:
+        count = rollup["count"]
+        errors = sum(rollup["levels"].get(level, 0) for level in ERROR_LEVELS)
+        point = {
+            "timestamp": _minute_iso(minute),
+            "count": count,
+            "levels": dict(rollup["levels"]),
+            "error_rate": errors / count if count else 0.0,
+            "cpu_max": rollup["cpu_max"],
+            "memory_max": rollup["memory_max"],
+        }
+        for column in LATENCY_COLUMNS:
+            for q in (50, 95, 99):
+                point[f"{column}_p{q}"] = sketch_quantile(rollup[column], q / 100)
+        return point
@@ -0,0 +1,338 @@
+import fcntl
+import json
+import os
+import socket
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import timed
+from .logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+# Read once: os.umask can only be queried by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on `<path>.lock` across processes"""
+    lock_path = f"{path}.lock"
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def read_json(path, default=None):
+    """Load a JSON file, returning `default` if it is missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _file_mode(path: Path) -> int:
+    """Mode for a rewritten file: the existing file's, or the umask default for a new one"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_json_atomic(path, data, indent: Optional[int] = 2):
+    """Write JSON via a temp file and rename so readers never see a partial file"""
+    path = Path(path)
+    with timed("state_write"):
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=indent)
+            # mkstemp creates the file 0600; keep the permissions readers expect
+            os.chmod(tmp_path, _file_mode(path))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def update_json(path, update: Callable[[Any], Any], default=None, indent: Optional[int] = 2):
+    """Locked read-modify-write of a JSON file; `update` returns the new document"""
+    with file_lock(path):
+        data = update(read_json(path, default))
+        write_json_atomic(path, data, indent=indent)
+        return data
+
+
+class StateBackend:
+    """Shared state visible to every API worker
+
+    Values are JSON-serializable documents addressed by key; blobs hold
+    opaque bytes such as a pickled model. Leases implement leader election:
+    whoever holds a lease runs the singleton ingest/detect loop. A Redis
+    implementation maps get/set to GET/SET, update to WATCH/MULTI, append
+    to RPUSH and acquire_lease to SET NX PX.
+    """
+
+    def get(self, key: str, default=None):
+        raise NotImplementedError
+
+    def set(self, key: str, value):
+        raise NotImplementedError
+
+    def update(self, key: str, update: Callable[[Any], Any], default=None):
+        """Atomically replace the value at key with update(current)"""
+        raise NotImplementedError
+
+    def append(self, key: str, item) -> int:
+        """Append to the list at key and return its new length"""
+        raise NotImplementedError
+
+    def get_list(self, key: str) -> List:
+        raise NotImplementedError
+
+    def get_blob(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set_blob(self, key: str, value: bytes):
+        raise NotImplementedError
+
+    def acquire_lease(self, name: str, owner: str, ttl_s: float) -> bool:
+        """Take or renew a lease; False if another owner holds an unexpired one"""
+        raise NotImplementedError
+
+    def release_lease(self, name: str, owner: str):
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    """Process-local backend for single-worker runs and tests"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._values: Dict[str, str] = {}
+        self._lists: Dict[str, List[str]] = {}
+        self._blobs: Dict[str, bytes] = {}
+        self._leases: Dict[str, tuple] = {}
+
+    def get(self, key: str, default=None):
+        raw = self._values.get(key)
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._values[key] = json.dumps(value, default=str)
+
+    def update(self, key: str, update: Callable[[Any], Any], default=None):
+        with self._lock:
+            value = update(self.get(key, default))
+            self.set(key, value)
+            return value
+
+    def append(self, key: str, item) -> int:
+        with self._lock:
+            items = self._lists.setdefault(key, [])
+            items.append(json.dumps(item, default=str))
+            return len(items)
+
+    def get_list(self, key: str) -> List:
+        with self._lock:
+            return [json.loads(item) for item in self._lists.get(key, [])]
+
+    def get_blob(self, key: str) -> Optional[bytes]:
+        return self._blobs.get(key)
+
+    def set_blob(self, key: str, value: bytes):
+        with self._lock:
+            self._blobs[key] = value
+
+    def acquire_lease(self, name: str, owner: str, ttl_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder and holder[0] != owner and holder[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl_s)
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder and holder[0] == owner:
+                del self._leases[name]
+
+
+class SQLiteStateBackend(StateBackend):
+    """Backend shared by all processes on a host through one SQLite file
+
+    WAL mode lets readers proceed while a writer holds the lock, and every
+    read-modify-write runs inside BEGIN IMMEDIATE so concurrent workers
+    serialize instead of overwriting each other.
+    """
+
+    def __init__(self, path: str = "./state/platform_state.db"):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS list_items ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, value TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS list_items_key ON list_items (key, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases ("
+                         "name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, key: str, default=None):
+        row = self._connection().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key: str, value):
+        with timed("state_write"), self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value, default=str)))
+
+    def update(self, key: str, update: Callable[[Any], Any], default=None):
+        with timed("state_write"), self._transaction() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = update(default if row is None else json.loads(row[0]))
+            conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                         (key, json.dumps(value, default=str)))
+            return value
+
+    def append(self, key: str, item) -> int:
+        with timed("state_write"), self._transaction() as conn:
+            conn.execute("INSERT INTO list_items (key, value) VALUES (?, ?)",
+                         (key, json.dumps(item, default=str)))
+            return conn.execute("SELECT COUNT(*) FROM list_items WHERE key = ?", (key,)).fetchone()[0]
+
+    def get_list(self, key: str) -> List:
+        rows = self._connection().execute(
+            "SELECT value FROM list_items WHERE key = ? ORDER BY id", (key,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_blob(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute("SELECT value FROM blobs WHERE key = ?", (key,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set_blob(self, key: str, value: bytes):
+        with timed("state_write"), self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO blobs (key, value) VALUES (?, ?)", (key, sqlite3.Binary(value)))
+
+    def acquire_lease(self, name: str, owner: str, ttl_s: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                         (name, owner, now + ttl_s))
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+@contextmanager
+def held_lease(backend: StateBackend, name: str, ttl_s: float, wait_s: float = 0.0, poll_s: float = 0.1):
+    """Hold lease `name` for the duration of the block; yields whether it was acquired
+
+    Unlike LeaderElector this is a short-lived mutex: every call uses a new
+    owner id, so it also excludes other threads of the same process. Waits
+    up to `wait_s` for the current holder to release it. `ttl_s` only
+    matters if the holder dies inside the block.
+    """
+    owner = _owner_id()
+    deadline = time.monotonic() + wait_s
+    acquired = backend.acquire_lease(name, owner, ttl_s)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(poll_s)
+        acquired = backend.acquire_lease(name, owner, ttl_s)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            backend.release_lease(name, owner)
+
+
+class LeaderElector:
+    """Lease-based leader election on top of a StateBackend
+
+    Call is_leader() on every tick of the loop being guarded; it renews the
+    lease while held, and another worker takes over once the TTL lapses.
+    """
+
+    def __init__(self, backend: StateBackend, name: str, ttl_s: float = 30.0):
+        self.backend = backend
+        self.name = name
+        self.ttl_s = ttl_s
+        self.owner = _owner_id()
+        self._leader = False
+
+    def is_leader(self) -> bool:
+        leader = self.backend.acquire_lease(self.name, self.owner, self.ttl_s)
+        if leader != self._leader:
+            logger.info("Leadership %s", "acquired" if leader else "lost",
+                        extra={"lease": self.name, "owner": self.owner})
+            self._leader = leader
+        return leader
+
+    def resign(self):
+        if self._leader:
+            self.backend.release_lease(self.name, self.owner)
+            self._leader = False
+
+
+_backend: Optional[StateBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend() -> StateBackend:
+    """Process-wide backend chosen by STATE_BACKEND (sqlite|memory) and STATE_DB"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            kind = os.getenv("STATE_BACKEND", "sqlite")
+            if kind == "memory":
+                _backend = MemoryStateBackend()
+            elif kind == "sqlite":
+                _backend = SQLiteStateBackend(os.getenv("STATE_DB", "./state/platform_state.db"))
+            else:
+                raise ValueError(f"Unknown STATE_BACKEND: {kind}")
+        return _backend
@@ -1,15 +1,93 @@
-from openai import OpenAI
 import os
+import threading
+import time
+from typing import List, Optional
 from dotenv import load_dotenv
+from .metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+from .logging_setup import get_logger
+from .state_store import MemoryStateBackend, StateBackend
 
 # Load environment variables
 load_dotenv()
 
-def call_openai(prompt: str):
+LLM_MODEL = "gpt-3.5-turbo"
+
+logger = get_logger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _openai_client():
+    """Shared client, created on the first LLM call (the openai package is slow to import)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI()
+        return _client
+
+class TokenBudget:
+    """Tokens allowed per sliding one-minute window
+
+    Callers reserve an upper bound (prompt estimate plus max_tokens) before
+    each request; a reservation that would exceed the window is refused so
+    the caller can defer lower-priority work. Reservations are kept under
+    `key` in the state backend, so workers sharing a backend (e.g. the
+    SQLite one across uvicorn workers) share one budget; without a backend
+    the budget is per process.
+    """
+
+    def __init__(self, tokens_per_minute: int, window_s: float = 60.0,
+                 backend: Optional[StateBackend] = None, key: str = "llm.token_budget"):
+        self.tokens_per_minute = tokens_per_minute
+        self.window_s = window_s
+        self.backend = backend or MemoryStateBackend()
+        self.key = key
+
+    def _unexpired(self, spent: List, now: float) -> List:
+        return [entry for entry in spent if now - entry[0] < self.window_s]
+
+    def remaining(self) -> int:
+        spent = self._unexpired(self.backend.get(self.key, []), time.time())
+        return self.tokens_per_minute - sum(tokens for _, tokens in spent)
+
+    def try_reserve(self, tokens: int) -> bool:
+        granted = []
+
+        def reserve(spent: List) -> List:
+            now = time.time()
+            spent = self._unexpired(spent, now)
+            if sum(entry[1] for entry in spent) + tokens <= self.tokens_per_minute:
+                spent.append([now, tokens])
+                granted.append(True)
+            return spent
+
+        self.backend.update(self.key, reserve, default=[])
+        return bool(granted)
+
+
+def call_openai(prompt: str, max_tokens: Optional[int] = None):
     """Call OpenAI API for LLM-based remediation using gpt-3.5-turbo model."""
-    client = OpenAI()
-    chat_completion = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": prompt}],
-    )
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        client = _openai_client()
+        options = {"max_tokens": max_tokens} if max_tokens else {}
+        chat_completion = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            **options,
+        )
+        outcome = "success"
+    finally:
+        elapsed = time.perf_counter() - start
+        LLM_REQUEST_SECONDS.observe(elapsed, model=LLM_MODEL, outcome=outcome)
+        logger.debug("LLM call finished", extra={"model": LLM_MODEL, "outcome": outcome,
+                                                 "duration_s": round(elapsed, 3)})
+
+    usage = getattr(chat_completion, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=LLM_MODEL, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=LLM_MODEL, kind="completion")
     return chat_completion.choices[0].message.content
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""Reproducible benchmarks for the observability pipeline
+
+Generates a synthetic workload with logs/log_generator.py in a scratch
+directory, then times each pipeline stage and the HTTP endpoints with the
+LLM stubbed out. Reports throughput, p50/p99 latency and peak RSS, and can
+fail when results regress against a saved baseline:
+
+    python benchmark.py --rows 200000 --output bench.json
+    python benchmark.py --rows 200000 --baseline bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "logs"))
+
+STUB_LLM_RESPONSE = "1. Explanation: stub\n2. Fix: `kubectl rollout restart deploy/app`"
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name: str, func: Callable[[], int], iterations: int, warmup: int = 1,
+            setup: Callable[[], None] = None) -> Dict:
+    """Run func repeatedly; func returns the number of items it processed, or None"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+
+    latencies: List[float] = []
+    items = 0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        items += func() or 0
+        latencies.append(time.perf_counter() - start)
+
+    total = sum(latencies)
+    # Stages report rows processed; endpoints just count calls
+    unit, count = ("items", items) if items else ("calls", iterations)
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "throughput_per_s": count / total if total else 0.0,
+        "unit": unit,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"{name:<36} p50 {result['p50_ms']:>10.2f} ms  p99 {result['p99_ms']:>10.2f} ms  "
+          f"{result['throughput_per_s']:>12.0f} {result['unit']}/s  rss {result['peak_rss_mb']:>8.1f} MB")
+    return result
+
+
+def prepare_workspace(workdir: Path, rows: int, services: List[str], anomaly_rate: float, seed: int):
+    """Lay out logs/, state/ and config/ the way main.py expects them"""
+    import log_generator
+
+    (workdir / "state").mkdir(parents=True, exist_ok=True)
+    (workdir / "config").mkdir(parents=True, exist_ok=True)
+    df = log_generator.generate_logs(rows, services=services, anomaly_rate=anomaly_rate, seed=seed)
+    log_generator.write_logs(df, workdir / "logs")
+
+
+def stub_llm(monkeypatched_modules):
+    """Replace call_openai with an instant canned response everywhere it was imported"""
+    def fake_call_openai(prompt: str, max_tokens=None):
+        return STUB_LLM_RESPONSE
+
+    for module in monkeypatched_modules:
+        module.call_openai = fake_call_openai
+
+
+def bench_pipeline(args) -> List[Dict]:
+    from agents.log_reader import LogReader
+    from agents.anomaly_detector import AnomalyDetector
+    from agents.auto_scaler import AutoScaler
+    from agents.remediator import RemediationAgent
+
+    results = []
+    reader = LogReader("./logs")
+
+    def read_new():
+        reader.last_read_time = None
+        return len(reader.read_new_logs())
+
+    results.append(measure("log_reader.read_new_logs", read_new, args.iterations))
+    results.append(measure("log_reader.get_recent_logs(10)",
+                           lambda: len(reader.get_recent_logs(10)), args.iterations))
+
+    reader.last_read_time = None
+    logs = reader.read_new_logs()
+    detector = AnomalyDetector()
+
+    def fresh_detector():
+        # fit() skips services whose data is unchanged, so start each iteration unfitted
+        nonlocal detector
+        detector = AnomalyDetector()
+
+    results.append(measure("anomaly_detector.fit", lambda: detector.fit(logs) or len(logs), args.iterations,
+                           setup=fresh_detector))
+    results.append(measure("anomaly_detector.detect", lambda: len(logs) if detector.detect(logs) is not None else 0,
+                           args.iterations))
+
+    anomalies = detector.detect(logs)
+    scaler = AutoScaler("./config")
+    initial_state = scaler.state_file.read_text()
+    results.append(measure("auto_scaler.evaluate_scaling",
+                           lambda: len(anomalies) if scaler.evaluate_scaling(anomalies) is not None else 0,
+                           args.iterations, setup=lambda: scaler.state_file.write_text(initial_state)))
+
+    import main
+    remediator = RemediationAgent("./state")
+    sample = (anomalies or logs.records([0]))[0]
+    entry = {"timestamp": sample.get("timestamp"), "query": "benchmark", "response": STUB_LLM_RESPONSE}
+    results.append(measure("state.save_llm_response", lambda: main.save_llm_response(entry) or 1,
+                           args.iterations * 10))
+    results.append(measure("state.remediation_history",
+                           lambda: remediator._save_to_history({"anomaly": sample, "suggested_action": "x",
+                                                                "status": "pending"}) or 1,
+                           args.iterations * 10))
+    results.append(measure("main.clean_json(anomalies)", lambda: len(main.clean_json(anomalies)),
+                           args.iterations))
+    return results
+
+
+def bench_http(args) -> List[Dict]:
+    from fastapi.testclient import TestClient
+    import main
+    import agents.remediator
+
+    stub_llm([main, agents.remediator])
+    client = TestClient(main.app)
+    results = []
+
+    def hit(method: str, path: str):
+        def call():
+            client.request(method, path).raise_for_status()
+        return call
+
+    endpoints = [
+        ("GET", "/"),
+        ("GET", "/logs/recent?minutes=5"),
+        ("GET", "/api/anomalies"),
+        ("GET", "/api/anomalies/search?order=score&limit=20"),
+        ("GET", "/api/scaling"),
+        ("GET", "/api/llm-responses"),
+        ("GET", "/metrics"),
+        ("POST", "/api/process-first-anomaly"),
+    ]
+    for method, path in endpoints:
+        results.append(measure(f"http {method} {path}", hit(method, path), args.iterations))
+    return results
+
+
+def compare(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """Return descriptions of benchmarks whose p50 regressed beyond the threshold"""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before or not before["p50_ms"]:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        if change > max_regression:
+            regressions.append(f"{result['name']}: p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms "
+                               f"(+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Observability Platform pipeline")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic log rows to generate")
+    parser.add_argument("--services", nargs="+", default=None, help="Service names to emit")
+    parser.add_argument("--anomaly-rate", type=float, default=0.2, help="Fraction of non-INFO rows")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the workload")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed iterations per benchmark")
+    parser.add_argument("--only", choices=["pipeline", "http"], help="Run a single benchmark group")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed fractional p50 slowdown versus the baseline")
+    parser.add_argument("--keep-workdir", action="store_true", help="Do not delete the scratch directory")
+    args = parser.parse_args()
+
+    # Keep benchmark output readable; errors still surface
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    workdir = Path(tempfile.mkdtemp(prefix="observability-bench-"))
+    original_cwd = os.getcwd()
+    try:
+        started = time.perf_counter()
+        prepare_workspace(workdir, args.rows, args.services, args.anomaly_rate, args.seed)
+        print(f"Generated {args.rows} rows in {time.perf_counter() - started:.2f}s under {workdir}\n")
+        os.chdir(workdir)
+
+        results = []
+        if args.only in (None, "pipeline"):
+            results += bench_pipeline(args)
+        if args.only in (None, "http"):
+            results += bench_http(args)
+    finally:
+        os.chdir(original_cwd)
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"rows": args.rows, "iterations": args.iterations, "seed": args.seed, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
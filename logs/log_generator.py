@@ -1,46 +1,185 @@
+import argparse
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
 import pandas as pd
 from faker import Faker
-import random
-from datetime import datetime, timedelta
 
-fake = Faker()
-services = ["web-server", "database", "auth-service", "payment-service"]
+DEFAULT_SERVICES = ["web-server", "database", "auth-service", "payment-service"]
 error_codes = ["HTTP_503", "DB_CONN_TIMEOUT", "DEADLOCK", "PAYMENT_GATEWAY_TIMEOUT", ""]
 actions = ["blocked", ""]
+COLUMNS = ["timestamp", "level", "service", "message", "response_time", "client_ip",
+           "error_code", "execution_time", "query_type", "cpu_usage", "memory_usage",
+           "affected_tables", "action"]
+
+# Faker is slow per call, so draw a fixed pool of values once and sample from it
+POOL_SIZE = 512
+# Pre-rendered integer strings, indexed instead of converting ints row by row
+_INT_STRINGS = np.array([str(i) for i in range(1501)], dtype=object)
+
+
+@lru_cache(maxsize=4)
+def _fake_pools(seed: int):
+    fake = Faker()
+    Faker.seed(seed)
+    return {
+        "uri": np.array([fake.uri_path() for _ in range(POOL_SIZE)], dtype=object),
+        "word": np.array([fake.word() for _ in range(POOL_SIZE)], dtype=object),
+        "user": np.array([fake.user_name() for _ in range(POOL_SIZE)], dtype=object),
+        "sentence": np.array([fake.sentence() for _ in range(POOL_SIZE)], dtype=object),
+    }
+
+
+def _where(mask: np.ndarray, values, default: str = "") -> np.ndarray:
+    out = np.full(mask.shape, default, dtype=object)
+    if isinstance(values, np.ndarray):
+        out[mask] = values[mask]
+    else:
+        out[mask] = values
+    return out
+
+
+def generate_logs(rows: int = 10000, start: Optional[datetime] = None, interval_s: float = 5.0,
+                  services: Optional[List[str]] = None, anomaly_rate: float = 0.2,
+                  seed: int = 42) -> pd.DataFrame:
+    """Generate synthetic log rows with vectorized sampling
+
+    anomaly_rate is the fraction of rows logged at ERROR/WARNING/CRITICAL
+    rather than INFO. Services beyond the four built-in ones get generic
+    messages and no service-specific fields.
+    """
+    rng = np.random.default_rng(seed)
+    pools = _fake_pools(seed)
+    services = np.array(services or DEFAULT_SERVICES, dtype=object)
+    start = start or datetime(2024, 2, 15, 8, 0, 0)
+
+    offsets_ms = (np.arange(rows, dtype=np.float64) * interval_s * 1000).astype("timedelta64[ms]")
+    instants = np.datetime64(start, "ms") + offsets_ms
+    timestamps = np.datetime_as_string(instants, unit="s").astype(object) + "Z"
+
+    service = services[rng.integers(0, len(services), rows)]
+    is_info = rng.random(rows) >= anomaly_rate
+    level = np.where(is_info, "INFO",
+                     np.array(["ERROR", "WARNING", "CRITICAL"], dtype=object)[rng.integers(0, 3, rows)]).astype(object)
+
+    web = service == "web-server"
+    db = service == "database"
+    auth = service == "auth-service"
+    critical = level == "CRITICAL"
+
+    def pick(pool):
+        return pools[pool][rng.integers(0, POOL_SIZE, rows)]
+
+    def randint_str(low, high):
+        return _INT_STRINGS[rng.integers(low, high, rows)]
 
-def generate_log_entry(timestamp):
-    service = random.choice(services)
-    level = "INFO" if random.random() > 0.2 else random.choice(["ERROR", "WARNING", "CRITICAL"])
-    
-    log = {
-        "timestamp": timestamp.isoformat() + "Z",
+    # payment-service keeps the original empty message; unknown services get a generic one
+    message = np.where(np.isin(service, DEFAULT_SERVICES), "", "Service " + service + " event").astype(object)
+    web_ok = "GET " + pick("uri") + " OK - 200"
+    web_fail = "GET " + pick("uri") + " FAILED - " + rng.choice(["500", "503"], rows).astype(object)
+    message[web] = np.where(is_info, web_ok, web_fail)[web]
+    db_msg = "Query " + np.where(is_info, "SUCCESS", "FAILED").astype(object) + ": SELECT * FROM " + pick("word")
+    message[db] = db_msg[db]
+    auth_msg = np.where(is_info, "User login: " + pick("user"), "SQL injection attempt detected: " + pick("sentence"))
+    message[auth] = auth_msg[auth]
+
+    octets = _INT_STRINGS[rng.integers(1, 255, (rows, 4))]
+    client_ip = octets[:, 0] + "." + octets[:, 1] + "." + octets[:, 2] + "." + octets[:, 3]
+
+    df = pd.DataFrame({
+        "timestamp": timestamps,
         "level": level,
         "service": service,
-        "message": "",
-        "response_time": f"{random.randint(50, 200)}ms" if service == "web-server" else "",
-        "client_ip": fake.ipv4() if service in ["web-server", "auth-service"] else "",
-        "error_code": random.choice(error_codes) if level in ["ERROR", "FATAL"] else "",
-        "execution_time": f"{random.randint(30, 1500)}ms" if service == "database" else "",
-        "query_type": random.choice(["read", "write"]) if service == "database" else "",
-        "cpu_usage": random.randint(1, 99) if level == "CRITICAL" else "",
-        "memory_usage": f"{random.randint(1, 99)}%" if level == "CRITICAL" else "",
-        "affected_tables": "orders;users" if random.random() > 0.8 else "",
-        "action": random.choice(actions) if service == "auth-service" else ""
-    }
-    
-    # Custom messages based on service/level
-    if service == "web-server":
-        log["message"] = f"GET {fake.uri_path()} OK - 200" if level == "INFO" else f"GET {fake.uri_path()} FAILED - {random.choice([500, 503])}"
-    elif service == "database":
-        log["message"] = f"Query {'SUCCESS' if level == 'INFO' else 'FAILED'}: SELECT * FROM {fake.word()}"
-    elif service == "auth-service":
-        log["message"] = f"User login: {fake.user_name()}" if level == "INFO" else f"SQL injection attempt detected: {fake.sentence()}"
-    
-    return log
-
-# Generate 10,000 logs over 24 hours
-start_time = datetime(2024, 2, 15, 8, 0, 0)
-logs = [generate_log_entry(start_time + timedelta(seconds=5*i)) for i in range(10000)]
-
-df = pd.DataFrame(logs)
-df.to_csv("large_logs.csv", index=False)
\ No newline at end of file
+        "message": message,
+        "response_time": _where(web, randint_str(50, 201) + "ms"),
+        "client_ip": _where(web | auth, client_ip),
+        "error_code": _where(level == "ERROR", np.array(error_codes, dtype=object)[rng.integers(0, len(error_codes), rows)]),
+        "execution_time": _where(db, randint_str(30, 1501) + "ms"),
+        "query_type": _where(db, rng.choice(["read", "write"], rows).astype(object)),
+        "cpu_usage": _where(critical, randint_str(1, 100)),
+        "memory_usage": _where(critical, randint_str(1, 100) + "%"),
+        "affected_tables": _where(rng.random(rows) > 0.8, "orders;users"),
+        "action": _where(auth, np.array(actions, dtype=object)[rng.integers(0, len(actions), rows)]),
+    }, columns=COLUMNS)
+    return df
+
+
+def write_logs(df: pd.DataFrame, output_dir: str = ".", files: int = 1,
+               prefix: str = "large_logs") -> List[Path]:
+    """Write logs to one or more CSV files, split into contiguous time ranges"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if files <= 1:
+        paths = [output_dir / f"{prefix}.csv"]
+        df.to_csv(paths[0], index=False)
+        return paths
+
+    paths = []
+    for i, chunk in enumerate(np.array_split(np.arange(len(df)), files)):
+        path = output_dir / f"{prefix}_{i:03d}.csv"
+        df.iloc[chunk].to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def append_live(path: str, events_per_sec: float, duration_s: Optional[float] = None,
+                services: Optional[List[str]] = None, anomaly_rate: float = 0.2,
+                seed: int = 42, batch_interval_s: float = 1.0):
+    """Append freshly timestamped rows to a CSV at a target rate
+
+    Rows are written in one batch per batch_interval_s. Runs until
+    duration_s elapses, or forever when it is None.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    batch_rows = max(1, int(round(events_per_sec * batch_interval_s)))
+    write_header = not path.exists() or path.stat().st_size == 0
+    started = time.monotonic()
+    batch = 0
+    while duration_s is None or time.monotonic() - started < duration_s:
+        batch_start = time.monotonic()
+        df = generate_logs(batch_rows, start=datetime.utcnow(), interval_s=batch_interval_s / batch_rows,
+                           services=services, anomaly_rate=anomaly_rate, seed=seed + batch)
+        df.to_csv(path, mode="a", header=write_header, index=False)
+        write_header = False
+        batch += 1
+        time.sleep(max(0.0, batch_interval_s - (time.monotonic() - batch_start)))
+    return batch * batch_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic log generator for the Observability Platform")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of rows to generate")
+    parser.add_argument("--services", nargs="+", default=DEFAULT_SERVICES, help="Service names to emit")
+    parser.add_argument("--anomaly-rate", type=float, default=0.2, help="Fraction of non-INFO rows")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between consecutive rows")
+    parser.add_argument("--start", default="2024-02-15T08:00:00", help="Timestamp of the first row")
+    parser.add_argument("--files", type=int, default=1, help="Split output across this many CSV files")
+    parser.add_argument("--output-dir", default=".", help="Directory to write CSV files to")
+    parser.add_argument("--prefix", default="large_logs", help="CSV file name prefix")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--live", action="store_true", help="Append rows continuously instead of writing a batch")
+    parser.add_argument("--eps", type=float, default=100.0, help="Target events/sec in --live mode")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds to run in --live mode")
+    args = parser.parse_args()
+
+    if args.live:
+        path = Path(args.output_dir) / f"{args.prefix}.csv"
+        written = append_live(path, args.eps, args.duration, args.services, args.anomaly_rate, args.seed)
+        print(f"Appended {written} rows to {path}")
+        return
+
+    started = time.perf_counter()
+    df = generate_logs(args.rows, datetime.fromisoformat(args.start), args.interval,
+                       args.services, args.anomaly_rate, args.seed)
+    paths = write_logs(df, args.output_dir, args.files, args.prefix)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {len(df)} rows to {len(paths)} file(s) in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,40 @@
+import time
+_import_started = time.perf_counter()
+
 from dotenv import load_dotenv
 from fastapi import FastAPI, BackgroundTasks, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp, Receive, Scope, Send
-from typing import Dict, List, Callable
+from typing import TYPE_CHECKING, Dict, List, Callable, Optional, Set
 import asyncio
-import traceback
 from datetime import datetime
 import math
 import os
-import json
-import pandas as pd  # Add pandas import
+import threading
 
-from agents.log_reader import LogReader
-from agents.anomaly_detector import AnomalyDetector
-from agents.remediator import RemediationAgent
-from agents.auto_scaler import AutoScaler
+from agents.registry import (
+    MODEL_BLOB_KEY, MODEL_VERSION_KEY, ROLLUP_FEATURES_ENABLED, get_anomaly_detector, get_anomaly_store,
+    get_auto_scaler, get_log_reader, get_remediator, get_rollup_engine, preload, singleton, startup_report
+)
 from agents.utils import call_openai
+from agents.metrics import (
+    REGISTRY, CONTENT_TYPE, HTTP_REQUEST_SECONDS, CACHE_HITS, QUEUE_DEPTH, timed
+)
+from agents.logging_setup import configure_logging, get_logger, log_queue_depth
+from agents.state_store import LeaderElector, get_state_backend, held_lease, read_json, update_json
+
+if TYPE_CHECKING:
+    from agents.log_batch import LogBatch
 
 # Load environment variables
 load_dotenv()
 
+configure_logging()
+logger = get_logger("api")
+
 app = FastAPI(title="Intelligent Observability Platform")
 
 # CORS middleware must be added immediately after app creation
@@ -39,31 +51,198 @@ app.add_middleware(
   minimum_size=1000
 )
 
+class RequestTimingMiddleware:
+    """Record per-route request latency as a Prometheus histogram"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_holder = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template rather than raw path to keep cardinality bounded
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status_holder["status"],
+            )
+
+app.add_middleware(RequestTimingMiddleware)
+
 LLM_RESPONSES_FILE = os.path.join("state", "llm_responses.json")
 
+# Parsed llm_responses.json, reused until another worker rewrites the file
+_llm_responses_cache = {"mtime_ns": None, "entries": []}
+
 def load_llm_responses():
-    if os.path.exists(LLM_RESPONSES_FILE):
-        with open(LLM_RESPONSES_FILE, "r") as f:
-            try:
-                return json.load(f)
-            except Exception:
-                return []
-    return []
+    try:
+        mtime_ns = os.stat(LLM_RESPONSES_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return []
+    if mtime_ns == _llm_responses_cache["mtime_ns"]:
+        CACHE_HITS.inc(cache="llm_responses")
+        return _llm_responses_cache["entries"]
+    entries = read_json(LLM_RESPONSES_FILE, default=[])
+    _llm_responses_cache.update(mtime_ns=mtime_ns, entries=entries)
+    return entries
 
 def save_llm_response(entry):
-    responses = load_llm_responses()
-    responses.append(entry)
-    with open(LLM_RESPONSES_FILE, "w") as f:
-        json.dump(responses, f, indent=2)
+    def append(responses):
+        responses.append(entry)
+        return responses
+
+    os.makedirs("state", exist_ok=True)
+    update_json(LLM_RESPONSES_FILE, append, default=[])
+
+# Shared across uvicorn workers: read cursor, fitted model and leadership
+INGEST_INTERVAL_SECONDS = float(os.getenv("INGEST_INTERVAL_SECONDS", "0"))
+# Any worker may analyze, but only one at a time: the "analysis" lease keeps two
+# runs from reading past the same shared cursor. POST /analyze waits this long for
+# a running analysis to finish; the TTL only frees the lease if a worker dies mid-run.
+ANALYZE_WAIT_SECONDS = float(os.getenv("ANALYZE_WAIT_SECONDS", "30"))
+ANALYSIS_LEASE_TTL_SECONDS = 300.0
+# Construct the agents in a background thread at startup instead of on the first request
+PRELOAD_AGENTS = os.getenv("PRELOAD_AGENTS", "0") == "1"
+
+@singleton
+def get_ingest_leader():
+    return LeaderElector(get_state_backend(), "ingest", ttl_s=max(60.0, 3 * INGEST_INTERVAL_SECONDS))
+
+# Agents are built on first use (see agents/registry.py); these names keep
+# `from main import log_reader` and similar working
+_LAZY_ATTRIBUTES = {
+    "log_reader": get_log_reader,
+    "rollup_engine": get_rollup_engine,
+    "anomaly_detector": get_anomaly_detector,
+    "remediator": get_remediator,
+    "auto_scaler": get_auto_scaler,
+    "anomaly_store": get_anomaly_store,
+    "ingest_leader": get_ingest_leader,
+    "state_backend": get_state_backend,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# reactive: scale up on anomalies; predictive: scale to forecast load on each ingest tick
+SCALING_MODE = os.getenv("SCALING_MODE", "reactive")
+_model_version = 0
+
+def detect_anomalies(logs: "LogBatch") -> List[Dict]:
+    """Run detection with the model shared by all workers
+
+    Loads newer published models before scoring, and publishes this
+    worker's models if the call had to fit any (e.g. a new service).
+    """
+    global _model_version
+    state_backend = get_state_backend()
+    anomaly_detector = get_anomaly_detector()
+    if ROLLUP_FEATURES_ENABLED:
+        get_rollup_engine().refresh()
+    shared_version = state_backend.get(MODEL_VERSION_KEY, 0)
+    if shared_version > _model_version:
+        blob = state_backend.get_blob(MODEL_BLOB_KEY)
+        if blob is not None:
+            anomaly_detector.load_model(blob)
+            _model_version = shared_version
+
+    revision = anomaly_detector.revision
+    anomalies = anomaly_detector.detect(logs)
+
+    if anomaly_detector.revision != revision:
+        state_backend.set_blob(MODEL_BLOB_KEY, anomaly_detector.export_model())
+        _model_version = state_backend.update(MODEL_VERSION_KEY, lambda version: version + 1, default=0)
+        logger.info("Published anomaly model", extra={"model_version": _model_version})
+
+    # Keep every detection searchable; a row seen again just updates its score
+    try:
+        get_anomaly_store().add(anomalies)
+    except Exception as e:
+        logger.exception("Error storing anomalies: %s", e)
+    return anomalies
 
-# Initialize agents
-log_reader = LogReader("./logs")
-anomaly_detector = AnomalyDetector()
-remediator = RemediationAgent()
-auto_scaler = AutoScaler()
+def analyze_new_logs(wait_s: float = 0.0):
+    """Read logs past the shared cursor and detect anomalies in them
 
-# Load LLM responses from file
-llm_responses = load_llm_responses()
+    Returns None if another run (on any worker) still holds the analysis
+    lease after `wait_s` seconds.
+    """
+    with held_lease(get_state_backend(), "analysis", ANALYSIS_LEASE_TTL_SECONDS, wait_s=wait_s) as acquired:
+        if not acquired:
+            return None
+        new_logs = get_log_reader().read_new_logs()
+        if not new_logs:
+            return new_logs, []
+        return new_logs, detect_anomalies(new_logs)
+
+# Strong references to fire-and-forget tasks; the event loop only keeps weak ones
+_background_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro) -> asyncio.Task:
+    """Run `coro` in the background without letting it be garbage-collected mid-flight"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def ingest_loop():
+    """Periodically analyze new logs on whichever worker holds the ingest lease"""
+    while True:
+        try:
+            if get_ingest_leader().is_leader():
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, get_rollup_engine().refresh)
+                if SCALING_MODE == "predictive":
+                    auto_scaler = get_auto_scaler()
+                    load = get_rollup_engine().frame(minutes=auto_scaler.history_minutes())
+                    await loop.run_in_executor(None, auto_scaler.evaluate_predictive, load)
+                # None: a POST /analyze is running; its anomalies are processed there
+                _, anomalies = await loop.run_in_executor(None, analyze_new_logs) or (None, [])
+                # With no new anomalies this still drains ones deferred for token budget
+                remediator = get_remediator.peek()
+                if anomalies or (remediator is not None and remediator.deferred_count):
+                    spawn(process_anomalies(anomalies))
+        except Exception as e:
+            logger.exception("Error in ingest loop: %s", e)
+        await asyncio.sleep(INGEST_INTERVAL_SECONDS)
+
+def get_startup_report() -> Dict:
+    """How long importing this module took, plus agent construction so far"""
+    return {"import_seconds": round(IMPORT_SECONDS, 4), **startup_report()}
+
+@app.on_event("startup")
+async def start_ingest_loop():
+    logger.info("Startup report", extra=get_startup_report())
+    if PRELOAD_AGENTS:
+        threading.Thread(target=preload, name="preload-agents", daemon=True).start()
+    if INGEST_INTERVAL_SECONDS > 0:
+        app.state.ingest_task = asyncio.create_task(ingest_loop())
+
+@app.on_event("shutdown")
+async def stop_ingest_loop():
+    task = getattr(app.state, "ingest_task", None)
+    if task is not None:
+        task.cancel()
+    leader = get_ingest_leader.peek()
+    if leader is not None:
+        leader.resign()
 
 # Mock remediation history for demo/testing
 mock_remediation_history = [
@@ -83,8 +262,8 @@ mock_remediation_history = [
 async def global_exception_handler(request, exc):
     """Global exception handler for better error messages"""
     error_msg = str(exc)
-    print(f"Global exception handler caught: {error_msg}")
-    print(traceback.format_exc())
+    logger.error("Global exception handler caught: %s", error_msg, exc_info=exc,
+                 extra={"path": request.url.path})
     
     return JSONResponse(
         status_code=500,
@@ -96,50 +275,57 @@ async def global_exception_handler(request, exc):
     )
 
 async def process_anomalies(anomalies: List[Dict]):
-    """Process detected anomalies in the background, including LLM call."""
-    import asyncio
-    for anomaly in anomalies:
+    """Process detected anomalies in the background, including LLM call.
+
+    The LLM pass also answers anomalies deferred earlier for token budget,
+    so it can return remediations for more than `anomalies`.
+    """
+    loop = asyncio.get_event_loop()
+    QUEUE_DEPTH.inc(len(anomalies), queue="anomaly_processing")
+    try:
+        # One batched, budgeted LLM pass covers every anomaly
+        remediations = await loop.run_in_executor(None, get_remediator().suggest_remediations, anomalies)
+    except Exception as e:
+        logger.exception("Error requesting remediations: %s", e)
+        remediations = []
+    finally:
+        QUEUE_DEPTH.dec(len(anomalies), queue="anomaly_processing")
+
+    for remediation in remediations:
+        anomaly = remediation["anomaly"]
         try:
-            print(f"Processing anomaly: {anomaly}")
-            # Get remediation suggestions
-            remediation = await remediator.suggest_remediation(anomaly)
-            print(f"Remediation suggestion: {remediation}")
-            
-            # Enhanced prompt for code-focused remediation
-            prompt = f"""Please provide a detailed remediation solution with code examples for this issue:
-Issue Type: {anomaly.get('type', 'anomaly')}
-Service: {anomaly.get('service', 'unknown service')}
-Message: {anomaly.get('message', '')}
-
-Include in your response:
-1. Brief explanation of the issue
-2. Code snippets or commands to resolve the problem
-3. Configuration changes needed (if any)
-4. Verification steps with code examples"""
-
-            # Call LLM
-            loop = asyncio.get_event_loop()
-            llm_response = await loop.run_in_executor(None, call_openai, prompt)
-            print(f"LLM response: {llm_response}")
-            
-            # Store LLM response
-            llm_entry = {
-                "timestamp": anomaly.get("timestamp"),
-                "query": prompt,
-                "response": llm_response
-            }
-            llm_responses.append(llm_entry)
-            print(f"Appending LLM entry: {llm_entry}")
-            save_llm_response(llm_entry)
-            print(f"Saved LLM entry to file.")
-            
-            # Evaluate scaling actions
-            scaling_actions = auto_scaler.evaluate_scaling([anomaly])
-            if scaling_actions:
-                remediation["scaling_actions"] = scaling_actions
+            logger.debug("Remediation suggestion: %s", remediation, extra={"sampled": True})
+            if remediation["suggested_action"] is not None:
+                entry = {
+                    "timestamp": anomaly.get("timestamp"),
+                    "query": remediation["query"],
+                    "response": remediation["suggested_action"]
+                }
+                if "batch_id" in remediation:
+                    entry["batch_id"] = remediation["batch_id"]
+                save_llm_response(entry)
+                logger.info("Saved LLM response", extra={"service": anomaly.get("service"),
+                                                          "anomaly_timestamp": anomaly.get("timestamp")})
+        except Exception as e:
+            logger.exception("Error processing anomaly: %s", e)
+
+    # Evaluate scaling actions (predictive mode scales from the ingest loop instead)
+    if SCALING_MODE == "reactive" and anomalies:
+        try:
+            await loop.run_in_executor(None, get_auto_scaler().evaluate_scaling, anomalies)
         except Exception as e:
-            print(f"Error processing anomaly: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error evaluating scaling: %s", e)
+
+@app.get("/metrics")
+async def metrics():
+    """Expose pipeline metrics in the Prometheus text format"""
+    QUEUE_DEPTH.set(log_queue_depth(), queue="log")
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/api/startup")
+async def get_startup():
+    """Startup timing: module import time, agent construction times, heavy libraries loaded"""
+    return get_startup_report()
 
 @app.get("/")
 async def root():
@@ -148,21 +334,56 @@ async def root():
 @app.get("/logs/recent")
 async def get_recent_logs(minutes: int = 5):
     """Get logs from the last N minutes"""
-    return log_reader.get_recent_logs(minutes)
+    return get_log_reader().get_recent_logs(minutes).records()
+
+@app.get("/api/metrics/timeseries")
+async def get_metrics_timeseries(service: Optional[str] = None,
+                                 minutes: int = Query(60, ge=1, le=7 * 24 * 60),
+                                 start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None):
+    """Per-minute rollups per service: counts by level, latency quantiles, max CPU/memory"""
+    loop = asyncio.get_event_loop()
+    rollup_engine = get_rollup_engine()
+    await loop.run_in_executor(None, rollup_engine.refresh)
+    return {"series": rollup_engine.timeseries(service, minutes=minutes, start=start, end=end)}
+
+@app.get("/api/anomalies/search")
+async def search_anomalies(service: Optional[List[str]] = Query(None),
+                           level: Optional[List[str]] = Query(None),
+                           error_code: Optional[List[str]] = Query(None),
+                           start: Optional[datetime] = None,
+                           end: Optional[datetime] = None,
+                           min_score: Optional[float] = None,
+                           source: Optional[str] = None,
+                           order: str = Query("time", pattern="^(time|score)$"),
+                           limit: int = Query(50, ge=1, le=1000),
+                           cursor: Optional[str] = None):
+    """Search stored anomalies; order=score&limit=k gives the top k, next_cursor fetches the next page"""
+    try:
+        return get_anomaly_store().search(services=service, levels=level, error_codes=error_code,
+                                          start=start, end=end, min_score=min_score, source=source,
+                                          order=order, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/analyze")
 async def analyze_logs(background_tasks: BackgroundTasks):
     """Analyze new logs for anomalies"""
     try:
-        # Read new logs
-        new_logs = log_reader.read_new_logs()
-        
+        # Runs in a thread so reads keep being served; the analysis lease
+        # makes runs on every worker take turns on the shared cursor
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(None, analyze_new_logs, ANALYZE_WAIT_SECONDS)
+        if result is None:
+            return JSONResponse(status_code=409, headers={"Retry-After": "5"}, content={
+                "message": "Another log analysis is still running; retry shortly",
+            })
+
+        new_logs, anomalies = result
+
         if not new_logs:
             return {"message": "No new logs to analyze"}
         
-        # Detect anomalies
-        anomalies = anomaly_detector.detect(new_logs)
-        
         if anomalies:
             # Process anomalies in the background
             background_tasks.add_task(process_anomalies, anomalies)
@@ -178,24 +399,29 @@ async def analyze_logs(background_tasks: BackgroundTasks):
 @app.get("/remediation/history")
 async def get_remediation_history():
     """Get history of remediation actions"""
-    return remediator.get_history()
+    return get_remediator().get_history()
 
 @app.get("/scaling/status")
 async def get_scaling_status():
     """Get current scaling status of services"""
-    return auto_scaler.get_service_status()
+    return get_auto_scaler().get_service_status()
 
 @app.post("/scaling/reset")
 async def reset_scaling():
     """Reset service scaling to initial state"""
-    auto_scaler.reset_scaling()
+    get_auto_scaler().reset_scaling()
     return {"message": "Scaling state reset successfully"}
 
 def clean_json(obj):
+    """Replace NaN/inf floats with None and datetimes with ISO strings"""
+    with timed("clean_json"):
+        return _clean_json(obj)
+
+def _clean_json(obj):
     if isinstance(obj, dict):
-        return {k: clean_json(v) for k, v in obj.items()}
+        return {k: _clean_json(v) for k, v in obj.items()}
     elif isinstance(obj, list):
-        return [clean_json(v) for v in obj]
+        return [_clean_json(v) for v in obj]
     elif isinstance(obj, float):
         if math.isnan(obj) or math.isinf(obj):
             return None
@@ -210,43 +436,23 @@ async def get_anomalies():
     """Get recent anomalies with better error handling"""
     try:
         # Get logs from the last 10 minutes of available data
-        recent_logs = log_reader.get_recent_logs(10)
+        recent_logs = get_log_reader().get_recent_logs(10)
         
         if not recent_logs:
-            print("No recent logs found")
+            logger.debug("No recent logs found")
             return []
         
-        print(f"Found {len(recent_logs)} recent logs")
+        logger.debug("Found %d recent logs", len(recent_logs), extra={"sampled": True})
         
-        # Convert timestamps to proper format
-        for log in recent_logs:
-            if isinstance(log.get("timestamp"), str):
-                try:
-                    log["timestamp"] = datetime.fromisoformat(log["timestamp"].replace('Z', '+00:00'))
-                except ValueError as e:
-                    print(f"Error parsing timestamp: {e}")
-                    log["timestamp"] = datetime.now()  # Fallback to current time
+        # Detect anomalies; timestamps are parsed once by LogReader and only
+        # the anomalous rows come back as dicts
+        anomalies = detect_anomalies(recent_logs)
+        logger.debug("Detected %d anomalies", len(anomalies), extra={"sampled": True})
         
-        # Detect anomalies
-        anomalies = anomaly_detector.detect(recent_logs)
-        print(f"Detected {len(anomalies)} anomalies")
-        
-        # Prepare anomalies for JSON serialization
-        formatted_anomalies = []
-        for anomaly in anomalies:
-            formatted_anomaly = anomaly.copy()
-            if isinstance(formatted_anomaly.get("timestamp"), datetime):
-                formatted_anomaly["timestamp"] = formatted_anomaly["timestamp"].isoformat()
-            formatted_anomalies.append(formatted_anomaly)
-        
-        # Clean anomalies for JSON
-        cleaned_anomalies = [clean_json(anomaly) for anomaly in formatted_anomalies]
-        
-        return cleaned_anomalies
+        return clean_json(anomalies)
         
     except Exception as e:
-        print(f"Error in /api/anomalies: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in /api/anomalies: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -260,7 +466,7 @@ async def get_anomalies():
 async def get_scaling():
     """Get current scaling status"""
     try:
-        return auto_scaler.get_service_status()
+        return get_auto_scaler().get_service_status()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -271,7 +477,7 @@ async def get_remediation():
 
 @app.get("/api/llm-responses")
 async def get_llm_responses():
-    return llm_responses
+    return load_llm_responses()
 
 @app.get("/api/llm-response")
 async def get_llm_response(prompt: str = Query(...)):
@@ -297,7 +503,6 @@ async def llm_sample_response():
             "query": prompt,
             "response": response
         }
-        llm_responses.append(llm_entry)
         save_llm_response(llm_entry)
         return llm_entry
     except Exception as e:
@@ -316,7 +521,6 @@ async def llm_force_sample():
             "query": prompt,
             "response": response
         }
-        llm_responses.append(llm_entry)
         save_llm_response(llm_entry)
         return llm_entry
     except Exception as e:
@@ -325,132 +529,88 @@ async def llm_force_sample():
 @app.post("/api/llm-anomaly-sample")
 async def llm_anomaly_sample():
     """Process 1 sample anomaly with careful timestamp handling"""
-    print("Starting anomaly detection...")
-    recent_logs = log_reader.get_recent_logs(10)
+    logger.debug("Starting anomaly detection")
+    recent_logs = get_log_reader().get_recent_logs(10)
     if not recent_logs:
         return {"message": "No anomalies detected in recent logs."}
         
-    # Convert timestamps in logs
-    for log in recent_logs:
-        if isinstance(log.get("timestamp"), (datetime, pd.Timestamp)):
-            log["timestamp"] = log["timestamp"].isoformat()
-            
-    print(f"Processing {len(recent_logs)} logs...")
-    anomalies = anomaly_detector.detect(recent_logs)
+    logger.debug("Processing %d logs", len(recent_logs))
+    anomalies = detect_anomalies(recent_logs)
     if not anomalies:
         return {"message": "No anomalies detected in logs"}
         
     # Get first anomaly and ensure all nested timestamps are converted
     sample_anomaly = clean_json(anomalies[0])
     
-    # Create prompt that asks for code snippets
-    prompt = f"""Please provide a remediation solution with code examples for this issue:
-Issue Type: {sample_anomaly.get('type', 'unknown issue')}
-Service: {sample_anomaly.get('service', 'service')}
-Message: {sample_anomaly.get('message', '')}
-
-Include in your response:
-1. Brief explanation of the issue
-2. Code snippets or commands to fix the problem
-3. Any configuration changes needed"""
-    
-    print(f"Sending prompt to LLM: {prompt}")
-    
-    try:
-        # Send to LLM
-        response = call_openai(prompt)
-        print(f"Received LLM response: {response}")
-        
-        # Create entry with current timestamp
-        llm_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "query": prompt,
-            "response": response,
-            "anomaly": sample_anomaly
-        }
-        
-        # Save response
-        print("Saving to llm_responses.json...")
-        os.makedirs("state", exist_ok=True)
-        llm_responses.append(llm_entry)
-        save_llm_response(llm_entry)
-        print("Response saved successfully")
-        
-        return {"status": "success", "llm_entry": llm_entry}
-        
-    except Exception as e:
-        print(f"Error processing anomaly: {str(e)}")
-        return {"status": "error", "message": str(e)}
+    remediation = await get_remediator().suggest_remediation(sample_anomaly)
+    if remediation["suggested_action"] is None:
+        return {"status": "error", "message": remediation.get("error") or "LLM token budget exhausted"}
+
+    # Create entry with current timestamp
+    llm_entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "query": remediation["query"],
+        "response": remediation["suggested_action"],
+        "anomaly": sample_anomaly
+    }
+
+    # Save response
+    save_llm_response(llm_entry)
+    logger.info("Saved LLM response to llm_responses.json")
+
+    return {"status": "success", "llm_entry": llm_entry}
 
 @app.post("/api/process-first-anomaly")
 async def process_first_anomaly():
     """Process only the first detected anomaly and ensure LLM response is saved."""
     try:
-        print("Starting anomaly detection...")
-        recent_logs = log_reader.get_recent_logs(10)
+        logger.debug("Starting anomaly detection")
+        recent_logs = get_log_reader().get_recent_logs(10)
         if not recent_logs:
-            print("No logs found")
+            logger.info("No logs found")
             return {"status": "error", "message": "No logs found"}
 
-        print(f"Found {len(recent_logs)} logs, detecting anomalies...")
-        anomalies = anomaly_detector.detect(recent_logs)
+        logger.debug("Found %d logs, detecting anomalies", len(recent_logs))
+        anomalies = detect_anomalies(recent_logs)
         if not anomalies:
-            print("No anomalies detected")
+            logger.info("No anomalies detected")
             return {"status": "error", "message": "No anomalies detected"}
 
-        print(f"Detected {len(anomalies)} anomalies, processing first one...")
+        logger.debug("Detected %d anomalies, processing first one", len(anomalies))
         first_anomaly = anomalies[0]
         if isinstance(first_anomaly.get("timestamp"), datetime):
             first_anomaly["timestamp"] = first_anomaly["timestamp"].isoformat()
         
-        # Create code-focused prompt
-        prompt = f"""Please provide a detailed remediation solution with code examples for this issue:
-Issue Type: {first_anomaly.get('type', 'unknown')}
-Service: {first_anomaly.get('service', 'unknown')}
-Message: {first_anomaly.get('message', '')}
-
-Include in your response:
-1. Brief explanation of the issue
-2. Code snippets or commands to fix the problem
-3. Configuration changes needed (if any)
-4. Verification steps with code examples
-5. Rollback steps if needed"""
-
-        print(f"Sending prompt to LLM: {prompt}")
-
-        # Call LLM
-        try:
-            response = call_openai(prompt)
-            print(f"Received LLM response: {response}")
-            
-            # Create and save entry
-            llm_entry = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "query": prompt,
-                "response": response,
-                "anomaly_details": clean_json(first_anomaly)
-            }
-            
-            print("Saving response to llm_responses.json...")
-            os.makedirs("state", exist_ok=True)
-            llm_responses.append(llm_entry)
-            save_llm_response(llm_entry)
-            print("Response saved successfully")
-            
-            return {
-                "status": "success",
-                "anomaly": clean_json(first_anomaly),
-                "llm_response": llm_entry
-            }
-        except Exception as e:
-            print(f"Error calling LLM: {str(e)}")
-            return {"status": "error", "message": f"LLM error: {str(e)}"}
-            
+        remediation = await get_remediator().suggest_remediation(first_anomaly)
+        if remediation["suggested_action"] is None:
+            return {"status": "error",
+                    "message": f"LLM error: {remediation.get('error') or 'token budget exhausted'}"}
+
+        # Create and save entry
+        llm_entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "query": remediation["query"],
+            "response": remediation["suggested_action"],
+            "anomaly_details": clean_json(first_anomaly)
+        }
+
+        save_llm_response(llm_entry)
+        logger.info("Saved LLM response to llm_responses.json")
+
+        return {
+            "status": "success",
+            "anomaly": clean_json(first_anomaly),
+            "llm_response": llm_entry
+        }
+
     except Exception as e:
-        print(f"Error in process_first_anomaly: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in process_first_anomaly: %s", e)
         return {"status": "error", "message": str(e)}
 
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
+    # Workers share state through the state backend, so the read API can scale out
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, log_level="debug",
+                workers=int(os.getenv("API_WORKERS", "1")))
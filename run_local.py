@@ -1,9 +1,17 @@
+import time
+_started = time.perf_counter()
+
 import asyncio
 import argparse
-from main import log_reader, anomaly_detector, remediator, auto_scaler, process_anomalies
+from datetime import datetime
+from agents.registry import get_anomaly_store, get_auto_scaler, get_log_reader, get_remediator, startup_report
 
 async def run_analysis():
     """Run a complete analysis cycle"""
+    # main pulls in FastAPI; only the analysis path needs it
+    from main import detect_anomalies, process_anomalies
+    log_reader = get_log_reader()
+
     print("Reading logs...")
     new_logs = log_reader.read_new_logs()
     
@@ -14,7 +22,7 @@ async def run_analysis():
     print(f"Found {len(new_logs)} new log entries")
     
     print("\nDetecting anomalies...")
-    anomalies = anomaly_detector.detect(new_logs)
+    anomalies = detect_anomalies(new_logs)
     
     if not anomalies:
         print("No anomalies detected.")
@@ -26,22 +34,66 @@ async def run_analysis():
     await process_anomalies(anomalies)
     
     print("\nCurrent service scaling status:")
-    print(auto_scaler.get_service_status())
+    print(get_auto_scaler().get_service_status())
+
+def run_backfill(args):
+    """Re-run detection over a past time range and store the anomalies"""
+    from agents.backfill import run_backfill
+    from agents.registry import MODEL_BLOB_KEY, anomaly_detector_settings
+    from agents.state_store import get_state_backend
+
+    model_blob = None
+    if args.model == "shared":
+        model_blob = get_state_backend().get_blob(MODEL_BLOB_KEY)
+        if model_blob is None:
+            print("No shared model has been published yet; fitting on the backfill range instead")
+
+    def on_partition(progress, anomalies):
+        print(f"  {progress['partition_start']}: {progress['partitions']} done, {progress['remaining']} left, "
+              f"{progress['rows']} rows, {progress['anomalies']} anomalies, {progress['rows_per_sec']:.0f} rows/s")
+        # Side effects are opt-in: a backfill over weeks must not page the LLM or resize services
+        if args.with_llm and anomalies:
+            get_remediator().suggest_remediations(anomalies)
+        if args.with_scaling and anomalies:
+            get_auto_scaler().evaluate_scaling(anomalies)
+
+    start, end = args.backfill
+    print(f"Backfilling {start} to {end} in {args.partition_minutes}-minute partitions...")
+    summary = run_backfill(get_log_reader(), get_anomaly_store(), datetime.fromisoformat(start),
+                           datetime.fromisoformat(end), partition_minutes=args.partition_minutes,
+                           workers=args.workers, run_id=args.run_id, restart=args.restart,
+                           model_blob=model_blob, detector_settings=anomaly_detector_settings(),
+                           on_partition=on_partition)
+    print(f"\nRun {summary['run_id']}: {summary['partitions']} partitions processed, "
+          f"{summary['skipped']} already checkpointed, {summary['rows']} rows, {summary['anomalies']} anomalies "
+          f"in {summary['seconds']:.2f}s ({summary['rows_per_sec']:.0f} rows/s)")
 
 def main():
     parser = argparse.ArgumentParser(description="Local runner for Observability Platform")
     parser.add_argument("--analyze", action="store_true", help="Run log analysis")
     parser.add_argument("--reset-scaling", action="store_true", help="Reset service scaling state")
     parser.add_argument("--show-history", action="store_true", help="Show remediation history")
-    
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print time spent starting up and constructing agents")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                        help="Re-run detection on logs between two ISO timestamps (UTC if no offset)")
+    parser.add_argument("--partition-minutes", type=int, default=60, help="Backfill partition size")
+    parser.add_argument("--workers", type=int, default=None, help="Backfill worker processes (default: CPUs)")
+    parser.add_argument("--run-id", help="Backfill checkpoint name (default: derived from the range)")
+    parser.add_argument("--restart", action="store_true", help="Discard the backfill run's checkpoints and results")
+    parser.add_argument("--model", choices=["fit", "shared"], default="fit",
+                        help="Fit models on the backfill range, or start from the published shared model")
+    parser.add_argument("--with-llm", action="store_true", help="Request remediations for backfilled anomalies")
+    parser.add_argument("--with-scaling", action="store_true", help="Apply scaling for backfilled anomalies")
+
     args = parser.parse_args()
     
     if args.reset_scaling:
-        auto_scaler.reset_scaling()
+        get_auto_scaler().reset_scaling()
         print("Scaling state reset successfully")
         
     if args.show_history:
-        history = remediator.get_history()
+        history = get_remediator().get_history()
         print("\nRemediation History:")
         for item in history:
             print(f"\nTimestamp: {item['anomaly'].get('timestamp')}")
@@ -51,9 +103,15 @@ def main():
             
     if args.analyze:
         asyncio.run(run_analysis())
-        
-    if not any([args.analyze, args.reset_scaling, args.show_history]):
+
+    if args.backfill:
+        run_backfill(args)
+
+    if not any([args.analyze, args.reset_scaling, args.show_history, args.startup_report, args.backfill]):
         parser.print_help()
 
+    if args.startup_report:
+        print(f"\nStartup report: {time.perf_counter() - _started:.3f}s since start, {startup_report()}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""Replay historical logs against the reactive and predictive scaling policies
+
+Builds per-minute rollups from a log CSV, then steps through it minute by
+minute. The reactive policy sees the anomalies detected in the previous
+minute (as process_anomalies would); the predictive policy sees only the
+rollups before the current minute. New instances become ready after
+--startup-minutes. Each policy is charged instance-minutes as cost, and
+latency is estimated from the observed p95 with a queueing factor
+1 / (1 - utilization), normalized so the logged latency corresponds to
+--reference-utilization:
+
+    python simulate_scaling.py --logs logs/large_logs.csv --output sim.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT))
+
+
+def load_rollups(path: str):
+    """Per-minute rollups and the LogBatch for a log CSV"""
+    from agents.log_batch import CSV_DTYPES, LogBatch
+    from agents.log_reader import LogReader
+    from agents.rollups import RollupEngine
+
+    batch = LogBatch.from_frame(pd.read_csv(path, on_bad_lines='skip', dtype=CSV_DTYPES))
+    scratch = tempfile.mkdtemp(prefix="scaling-sim-")
+    engine = RollupEngine(LogReader(scratch), segment_dir=scratch, retention_minutes=10 ** 9)
+    engine.ingest(batch)
+    return engine.frame(), batch
+
+
+def simulate(policy: str, load: pd.DataFrame, anomalies_by_minute: Dict[int, List[Dict]],
+             args) -> Dict:
+    from agents.auto_scaler import AutoScaler, history_minutes
+
+    scaler = AutoScaler(tempfile.mkdtemp(prefix="scaling-sim-"))
+    state = scaler._initial_state()
+    for service_state in state['services'].values():
+        service_state['policy'] = {"capacity_per_instance": args.capacity, "method": args.method,
+                                   "season_minutes": args.season}
+
+    services = sorted(set(load['service']) & set(state['services']))
+    demand = load.pivot_table(index='service', columns='minute', values='count', aggfunc='sum')
+    latency = load.assign(latency=load[['response_time_p95', 'execution_time_p95']].astype(float).max(axis=1))
+    latency = latency.pivot_table(index='service', columns='minute', values='latency', aggfunc='max')
+    start, end = int(load['minute'].min()), int(load['minute'].max())
+    minutes = range(start, end + 1)
+    demand = demand.reindex(index=services, columns=minutes).fillna(0)
+    latency = latency.reindex(index=services, columns=minutes)
+
+    ready = {service: state['services'][service]['instances'] for service in services}
+    pending = defaultdict(list)  # minute -> [(service, delta)]
+    history = history_minutes(state)
+    instance_minutes = 0
+    overloaded = 0
+    slo_violations = 0
+    latencies = []
+    actions = 0
+
+    for minute in minutes:
+        now = minute * 60.0
+        if policy == "reactive":
+            decisions = scaler.plan_reactive(state, anomalies_by_minute.get(minute - 1, []), now=now)
+        else:
+            window = load[(load['minute'] < minute) & (load['minute'] >= minute - history)]
+            decisions = scaler.plan_predictive(state, window, now=now) if not window.empty else []
+        for action in decisions:
+            if action['service'] not in ready:
+                continue
+            actions += 1
+            delta = action['to_instances'] - action['from_instances']
+            if delta > 0:
+                pending[minute + args.startup_minutes].append((action['service'], delta))
+            else:
+                ready[action['service']] += delta
+        for service, delta in pending.pop(minute, []):
+            ready[service] += delta
+
+        for service in services:
+            instances = max(ready[service], 1)
+            instance_minutes += instances
+            utilization = demand.at[service, minute] / (instances * args.capacity)
+            if utilization > 1:
+                overloaded += 1
+            observed = latency.at[service, minute]
+            if observed == observed and observed > 0:
+                factor = (1 - args.reference_utilization) / (1 - min(utilization, 0.95))
+                estimated = observed * factor
+                latencies.append(estimated)
+                if estimated > args.slo_ms:
+                    slo_violations += 1
+
+    service_minutes = len(services) * len(minutes)
+    return {
+        "policy": policy,
+        "minutes": len(minutes),
+        "instance_minutes": instance_minutes,
+        "scaling_actions": actions,
+        "overloaded_pct": 100.0 * overloaded / service_minutes if service_minutes else 0.0,
+        "est_p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+        "est_p95_ms": float(np.percentile(latencies, 95)) if latencies else None,
+        "slo_violation_pct": 100.0 * slo_violations / len(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reactive and predictive scaling on historical logs")
+    parser.add_argument("--logs", default=str(ROOT / "logs" / "large_logs.csv"), help="Log CSV to replay")
+    parser.add_argument("--capacity", type=float, default=3.0, help="Events per minute one instance absorbs")
+    parser.add_argument("--startup-minutes", type=int, default=3, help="Delay before a new instance serves")
+    parser.add_argument("--method", choices=["holt_winters", "ewma"], default="holt_winters")
+    parser.add_argument("--season", type=int, default=None, help="Season length in minutes for Holt-Winters")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="Latency SLO for violation counts")
+    parser.add_argument("--reference-utilization", type=float, default=0.5,
+                        help="Utilization at which the logged latencies were observed")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    from agents.anomaly_detector import AnomalyDetector
+
+    load, batch = load_rollups(args.logs)
+    anomalies_by_minute = defaultdict(list)
+    for anomaly in AnomalyDetector().detect(batch):
+        minute = int(pd.Timestamp(anomaly['timestamp']).timestamp() // 60)
+        anomalies_by_minute[minute].append(anomaly)
+
+    results = [simulate(policy, load, anomalies_by_minute, args) for policy in ("reactive", "predictive")]
+
+    print(f"{'policy':<12}{'inst-min':>10}{'actions':>9}{'overload%':>11}{'p50 ms':>10}{'p95 ms':>10}{'SLO viol%':>11}")
+    for r in results:
+        print(f"{r['policy']:<12}{r['instance_minutes']:>10}{r['scaling_actions']:>9}{r['overloaded_pct']:>11.2f}"
+              f"{r['est_p50_ms'] or 0:>10.0f}{r['est_p95_ms'] or 0:>10.0f}{r['slo_violation_pct']:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"logs": args.logs, "capacity": args.capacity, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
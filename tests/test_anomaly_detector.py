@@ -0,0 +1,128 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+from pyod.models.iforest import IForest
+
+from agents.anomaly_detector import FALLBACK_MODEL, AnomalyDetector
+from agents.log_batch import LogBatch
+
+
+def make_logs(rows_per_service=200, services=("web-server", "database"), seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2024-02-15T08:00:00Z")
+    records = []
+    for service in services:
+        for i in range(rows_per_service):
+            records.append({
+                "timestamp": start + pd.Timedelta(seconds=i),
+                "level": "INFO",
+                "service": service,
+                "message": "request ok",
+                "response_time": f"{rng.normal(120, 10):.0f}ms",
+                "cpu_usage": f"{rng.normal(40, 5):.0f}%",
+                "memory_usage": f"{rng.normal(55, 5):.0f}%",
+            })
+    return LogBatch.from_records(records)
+
+
+def test_set_contamination_refits_only_that_service_on_detect():
+    detector = AnomalyDetector(max_workers=1)
+    logs = make_logs()
+    detector.detect(logs)
+    web_model, database_model = detector.models["web-server"], detector.models["database"]
+
+    detector.set_contamination("database", 0.01)
+    detector.detect(logs)
+
+    assert detector.models["web-server"] is web_model
+    assert detector.models["database"] is not database_model
+    assert detector.models["database"].contamination == 0.01
+
+
+def test_detect_refits_changed_data_but_not_from_a_small_batch():
+    detector = AnomalyDetector(max_workers=1)
+    detector.detect(make_logs(seed=0))
+    first = dict(detector.models)
+
+    detector.detect(make_logs(rows_per_service=30, seed=1))
+    assert detector.models == first
+
+    detector.detect(make_logs(seed=2))
+    assert detector.models["web-server"] is not first["web-server"]
+
+
+def test_single_row_of_new_service_is_scored_by_pooled_model():
+    detector = AnomalyDetector(max_workers=1)
+    logs = make_logs()
+    detector.detect(logs)
+
+    spike = LogBatch.from_records([{
+        "timestamp": pd.Timestamp("2024-02-15T09:00:00Z"), "level": "ERROR", "service": "cache",
+        "message": "request blocked", "response_time": "5000ms", "cpu_usage": "99%", "memory_usage": "97%",
+    }])
+    anomalies = detector.detect(spike)
+
+    assert [anomaly["service"] for anomaly in anomalies] == ["cache"]
+    assert "cache" not in detector.models
+    assert detector.fit_rows[FALLBACK_MODEL] == len(logs)
+
+
+def test_first_batch_too_small_fits_nothing():
+    detector = AnomalyDetector(max_workers=1)
+    assert detector.detect(make_logs(rows_per_service=1)) == []
+    assert not detector.is_fitted
+
+
+def test_load_model_refits_instead_of_loading_outdated_blob():
+    detector = AnomalyDetector(max_workers=1)
+    assert detector.load_model(pickle.dumps(IForest())) is False
+    assert not detector.is_fitted
+
+    logs = make_logs()
+    detector.detect(logs)
+    other = AnomalyDetector(max_workers=1)
+    assert other.load_model(detector.export_model()) is True
+    assert set(other.models) == set(detector.models)
+
+
+class ZeroRollups:
+    def row_features(self, logs):
+        return pd.DataFrame({"minute_error_rate": 0.0, "minute_latency_p95": 0.0}, index=logs.frame.index)
+
+
+def test_model_fitted_on_other_features_is_refitted_not_loaded():
+    logs = make_logs()
+    plain = AnomalyDetector(max_workers=1)
+    plain.detect(logs)
+
+    with_rollups = AnomalyDetector(max_workers=1, rollups=ZeroRollups())
+    assert with_rollups.load_model(plain.export_model()) is False
+    assert with_rollups.detect(logs)
+    assert with_rollups.models["web-server"].n_features_in_ == len(with_rollups.features)
+
+
+def test_detect_without_refit_keeps_the_models():
+    detector = AnomalyDetector(max_workers=1)
+    detector.detect(make_logs(seed=0))
+    models, revision = dict(detector.models), detector.revision
+
+    detector.detect(make_logs(seed=1), refit=False)
+
+    assert detector.models == models
+    assert detector.revision == revision
+    assert AnomalyDetector(max_workers=1).detect(make_logs(), refit=False) == []
+
+
+def test_top_up_refits_loaded_models_with_other_contamination():
+    logs = make_logs()
+    shared = AnomalyDetector(max_workers=1)
+    shared.fit(logs)
+
+    detector = AnomalyDetector(max_workers=1, service_contamination={"database": 0.05})
+    detector.load_model(shared.export_model())
+    loaded = detector.models["web-server"]
+    detector.fit(logs, only_missing=True)
+
+    assert detector.models["web-server"] is loaded
+    assert detector.models["database"].contamination == 0.05
@@ -0,0 +1,79 @@
+import base64
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from agents.anomaly_store import AnomalyStore, _decode_cursor, _encode_cursor, _epoch_seconds
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_naive_timestamps_are_utc_regardless_of_local_timezone(new_york):
+    expected = datetime(2024, 2, 15, 8, tzinfo=timezone.utc).timestamp()
+    assert _epoch_seconds(datetime(2024, 2, 15, 8)) == expected
+    assert _epoch_seconds("2024-02-15T08:00:00") == expected
+    assert _epoch_seconds("2024-02-15T08:00:00Z") == expected
+    assert _epoch_seconds("2024-02-15T03:00:00-05:00") == expected
+
+
+def test_search_window_with_naive_bounds_matches_utc_rows(tmp_path, new_york):
+    store = AnomalyStore(str(tmp_path / "anomalies.db"))
+    store.add([{"timestamp": "2024-02-15T08:30:00Z", "service": "web-server", "level": "ERROR",
+                "anomaly_score": 0.5}])
+
+    found = store.search(start=datetime(2024, 2, 15, 8), end=datetime(2024, 2, 15, 9))
+    assert [item["timestamp"] for item in found["items"]] == ["2024-02-15T08:30:00Z"]
+
+
+def make_anomalies(count):
+    return [{"timestamp": f"2024-02-15T08:{i // 60:02d}:{i % 60:02d}Z", "service": "database", "level": "ERROR",
+             "message": f"timeout {i}", "anomaly_score": round(0.01 * (i % 7), 2)} for i in range(count)]
+
+
+def test_cursor_round_trip():
+    cursor = _encode_cursor("score", 0.42, 17)
+    assert _decode_cursor(cursor, "score") == (0.42, 17)
+
+
+def test_tampered_or_mismatched_cursor_is_rejected():
+    with pytest.raises(ValueError, match="Malformed"):
+        _decode_cursor("not-a-cursor!", "time")
+    with pytest.raises(ValueError, match="Malformed"):
+        _decode_cursor(base64.urlsafe_b64encode(b'["time", 1.0]').decode(), "time")
+    with pytest.raises(ValueError, match="order=score"):
+        _decode_cursor(_encode_cursor("score", 0.5, 3), "time")
+
+
+def test_pages_cover_every_row_once_in_order(tmp_path):
+    store = AnomalyStore(str(tmp_path / "anomalies.db"))
+    store.add(make_anomalies(25))
+
+    for order, column in (("time", "timestamp"), ("score", "anomaly_score")):
+        items, cursor = [], None
+        while True:
+            page = store.search(order=order, limit=10, cursor=cursor)
+            items.extend(page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert len({item["id"] for item in items}) == 25
+        keys = [(item[column], item["id"]) for item in items]
+        assert keys == sorted(keys, reverse=True)
+
+
+def test_same_row_detected_again_updates_instead_of_duplicating(tmp_path):
+    store = AnomalyStore(str(tmp_path / "anomalies.db"))
+    anomaly = make_anomalies(1)[0]
+    store.add([anomaly])
+    store.add([{**anomaly, "anomaly_score": 0.9}])
+
+    assert store.count() == 1
+    assert store.search(order="score")["items"][0]["anomaly_score"] == 0.9
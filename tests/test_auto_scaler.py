@@ -0,0 +1,86 @@
+import json
+
+import pandas as pd
+import pytest
+
+from agents.auto_scaler import AutoScaler
+
+# The default policy plans 3 events/min per instance at 0.6 target utilization,
+# i.e. 1.8 events/min each
+NOW = 10_000.0
+
+
+def make_load(counts, minutes=60, latency=100.0):
+    """Flat per-minute load for each service, ending at minute 1000"""
+    return pd.DataFrame([
+        {"service": service, "minute": minute, "count": count,
+         "response_time_p95": latency, "execution_time_p95": float("nan")}
+        for service, count in counts.items() for minute in range(1000 - minutes + 1, 1001)
+    ])
+
+
+@pytest.fixture
+def scaler(tmp_path):
+    return AutoScaler(str(tmp_path))
+
+
+def test_scale_up_sizes_for_the_forecast_and_clamps_to_max(scaler):
+    state = scaler._initial_state()
+    actions = scaler.plan_predictive(state, make_load({"web-server": 7.0, "database": 1000}), now=NOW)
+
+    assert {action["service"]: action["to_instances"] for action in actions} == {"web-server": 4, "database": 3}
+    assert state["services"]["database"]["last_scale_up_at"] == NOW
+
+
+def test_scale_up_waits_for_its_cooldown(scaler):
+    state = scaler._initial_state()
+    scaler.plan_predictive(state, make_load({"web-server": 3.5}), now=NOW)
+
+    busier = make_load({"web-server": 7.0})
+    assert scaler.plan_predictive(state, busier, now=NOW + 30) == []
+    assert [action["to_instances"] for action in scaler.plan_predictive(state, busier, now=NOW + 60)] == [4]
+
+
+def test_latency_above_slo_adds_an_instance(scaler):
+    state = scaler._initial_state()
+    actions = scaler.plan_predictive(state, make_load({"web-server": 0.5}, latency=1500.0), now=NOW)
+
+    assert [(action["from_instances"], action["to_instances"]) for action in actions] == [(1, 2)]
+    assert "latency" in actions[0]["reason"]
+
+
+def test_scale_down_is_gradual_and_respects_hysteresis_and_cooldown(scaler):
+    state = scaler._initial_state()
+    state["services"]["web-server"]["instances"] = 3
+    quiet = make_load({"web-server": 0.1})
+
+    assert [action["to_instances"] for action in scaler.plan_predictive(state, quiet, now=NOW)] == [2]
+    # Within the scale-down cooldown of the last change
+    assert scaler.plan_predictive(state, quiet, now=NOW + 60) == []
+
+    # 1.5 events/min fits one instance at target, but not inside the hysteresis band
+    state["services"]["web-server"]["last_scale_down_at"] = 0
+    assert scaler.plan_predictive(state, make_load({"web-server": 1.5}), now=NOW + 60) == []
+
+
+def test_scale_down_stops_at_min_instances(scaler):
+    state = scaler._initial_state()
+    state["services"]["web-server"].update(instances=3, min_instances=2)
+    quiet = make_load({"web-server": 0.0})
+
+    assert [action["to_instances"] for action in scaler.plan_predictive(state, quiet, now=NOW)] == [2]
+    assert scaler.plan_predictive(state, quiet, now=NOW + 10 * 900) == []
+
+
+def test_reset_keeps_limits_policies_and_cooldowns(scaler):
+    state = json.loads(scaler.state_file.read_text())
+    web = state["services"]["web-server"]
+    web.update(instances=4, min_instances=2, last_scale_up_at=NOW, policy={"target_utilization": 0.8})
+    del state["services"]["database"]
+    scaler.state_file.write_text(json.dumps(state))
+
+    scaler.reset_scaling()
+
+    services = json.loads(scaler.state_file.read_text())["services"]
+    assert services["web-server"] == {**web, "instances": 2}
+    assert services["database"]["instances"] == 1
@@ -0,0 +1,35 @@
+import numpy as np
+
+from agents.forecasting import ewma, holt_winters
+
+
+def test_ewma_smooths_each_row_independently():
+    values = np.array([[10, 10, 10, 10], [0, 10, 10, 10]])
+    smoothed = ewma(values, alpha=0.5)
+
+    assert smoothed.shape == values.shape
+    np.testing.assert_allclose(smoothed[0], 10)
+    np.testing.assert_allclose(smoothed[1], [0, 5, 7.5, 8.75])
+
+
+def test_holt_winters_extends_a_linear_trend():
+    values = np.arange(60, dtype=float)[None, :] * 2
+    forecast = holt_winters(values, horizon=3)
+
+    np.testing.assert_allclose(forecast, [[120, 122, 124]], atol=1e-6)
+
+
+def test_holt_winters_repeats_the_season():
+    pattern = np.array([0, 0, 0, 30, 0, 0], dtype=float)
+    values = np.tile(pattern, 20)[None, :] + 5
+    forecast = holt_winters(values, horizon=6, season=6)
+
+    assert forecast.shape == (1, 6)
+    assert forecast[0].argmax() == 3
+    np.testing.assert_allclose(forecast[0], pattern + 5, atol=2)
+
+
+def test_holt_winters_short_or_falling_history():
+    assert holt_winters(np.empty((2, 0)), horizon=4).shape == (2, 4)
+    np.testing.assert_allclose(holt_winters([[7.0]], horizon=2), [[7, 7]])
+    assert (holt_winters([[50, 40, 30, 20, 10]], horizon=10) >= 0).all()
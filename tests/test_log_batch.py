@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from agents.log_batch import LogBatch, extract_number
+
+
+def test_extract_number_parses_categories_strings_and_numbers():
+    categorical = pd.Series(["85%", "143ms", None, "85%", "12.5ms"], dtype="category")
+    assert extract_number(categorical).tolist() == [85.0, 143.0, 0.0, 85.0, 12.5]
+    assert extract_number(pd.Series(["85%", None, "n/a"])).tolist() == [85.0, 0.0, 0.0]
+    assert extract_number(pd.Series([1, np.nan, 3.5])).tolist() == [1.0, 0.0, 3.5]
+
+
+def test_from_records_parses_timestamps_and_interns_categories():
+    batch = LogBatch.from_records([
+        {"timestamp": "2024-02-15T08:00:00Z", "level": "INFO", "service": "web-server", "response_time": "10ms"},
+        {"timestamp": "2024-02-15T08:00:05Z", "level": "ERROR", "service": "web-server", "response_time": None},
+    ])
+    assert pd.api.types.is_datetime64_any_dtype(batch.frame["timestamp"])
+    assert isinstance(batch.frame["service"].dtype, pd.CategoricalDtype)
+    assert list(batch.frame["service"].cat.categories) == ["web-server"]
+    assert batch.numeric("response_time").tolist() == [10.0, 0.0]
+    assert batch.numeric("cpu_usage").tolist() == [0.0, 0.0]
+
+
+def test_concat_reinterns_categories_that_differ_between_files():
+    first = LogBatch.from_records([{"timestamp": "2024-02-15T08:00:00Z", "level": "INFO", "service": "database"}])
+    second = LogBatch.from_records([{"timestamp": "2024-02-15T08:01:00Z", "level": "WARNING", "service": "auth"}])
+
+    batch = LogBatch.concat([first.frame, LogBatch().frame, second.frame])
+
+    assert len(batch) == 2
+    assert isinstance(batch.frame["level"].dtype, pd.CategoricalDtype)
+    assert batch.frame["service"].astype(str).tolist() == ["database", "auth"]
+    assert batch.max_timestamp() == pd.Timestamp("2024-02-15T08:01:00Z")
+    assert not LogBatch.concat([])
+
+
+def test_records_materializes_only_requested_rows_as_json_ready_dicts():
+    batch = LogBatch.from_records([
+        {"timestamp": "2024-02-15T08:00:00Z", "level": "INFO", "service": "web-server", "error_code": None},
+        {"timestamp": "2024-02-15T08:00:05Z", "level": "ERROR", "service": "database", "error_code": "E42"},
+    ])
+    records = batch.records([1])
+    assert records == [{"timestamp": "2024-02-15T08:00:05+00:00", "level": "ERROR", "service": "database",
+                        "error_code": "E42"}]
+    first = batch.records()[0]
+    assert first["error_code"] is None and not isinstance(first["error_code"], float)
+    assert batch.take([1]).records() == records
+    assert batch.records([]) == []
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from agents.log_reader import LogReader
+
+HEADER = "timestamp,level,service,message,response_time\n"
+
+
+def test_read_range_compares_naive_and_aware_timestamps_as_utc(tmp_path):
+    (tmp_path / "aware.csv").write_text(HEADER + "2024-02-15T08:00:00Z,INFO,web-server,ok,10ms\n"
+                                                 "2024-02-15T09:00:00Z,INFO,web-server,ok,10ms\n")
+    (tmp_path / "naive.csv").write_text(HEADER + "2024-02-15T08:30:00,INFO,database,ok,10ms\n")
+    reader = LogReader(str(tmp_path))
+
+    naive = reader.read_range(datetime(2024, 2, 15, 8), datetime(2024, 2, 15, 9))
+    aware = reader.read_range(datetime(2024, 2, 15, 8, tzinfo=timezone.utc),
+                              datetime(2024, 2, 15, 9, tzinfo=timezone.utc))
+
+    assert len(naive) == len(aware) == 2
+    assert sorted(naive.frame["service"].astype(str)) == ["database", "web-server"]
@@ -0,0 +1,39 @@
+from agents.prompts import batch_prompt, plan_batches, split_batch_response
+
+ANOMALIES = [
+    {"service": "database", "level": "WARNING", "message": "slow query", "anomaly_score": 0.1},
+    {"service": "database", "level": "CRITICAL", "message": "deadlock", "anomaly_score": 0.2},
+    {"service": "web-server", "level": "CRITICAL", "message": "503s", "anomaly_score": 0.9},
+    {"service": "database", "level": "CRITICAL", "message": "replica lag", "anomaly_score": 0.5},
+]
+
+
+def test_split_batch_response_by_markers():
+    response = ("=== ANOMALY 1 ===\nRestart the pool.\n\n"
+                "## === ANOMALY 2 ===\nAdd an index.\n"
+                "**=== anomaly 3 ===**\nRoll back.")
+    assert split_batch_response(response, 3) == ["Restart the pool.", "Add an index.", "Roll back."]
+
+
+def test_split_batch_response_leaves_missing_and_empty_answers_as_none():
+    response = "=== ANOMALY 1 ===\nRestart the pool.\n=== ANOMALY 3 ===\n\n=== ANOMALY 7 ===\nstray"
+    assert split_batch_response(response, 3) == ["Restart the pool.", None, None]
+    assert split_batch_response("No markers at all", 2) == [None, None]
+    assert split_batch_response("Whole answer", 1) == ["Whole answer"]
+
+
+def test_batch_prompt_lists_each_anomaly_under_its_marker():
+    prompt = batch_prompt(ANOMALIES[:2])
+    assert "=== ANOMALY 1 ===\nService: database\nLevel: WARNING\nMessage: slow query" in prompt
+    assert "=== ANOMALY 2 ===\nService: database\nLevel: CRITICAL\nMessage: deadlock" in prompt
+    assert batch_prompt(ANOMALIES[:1]).count("=== ANOMALY") == 0
+
+
+def test_plan_batches_groups_by_service_and_severity_most_severe_first():
+    batches = plan_batches(ANOMALIES, max_batch=1)
+    assert [(b[0]["service"], b[0]["message"]) for b in batches] == [
+        ("web-server", "503s"), ("database", "replica lag"), ("database", "deadlock"), ("database", "slow query")]
+
+    grouped = plan_batches(ANOMALIES, max_batch=5)
+    assert [[a["message"] for a in batch] for batch in grouped] == [
+        ["503s"], ["replica lag", "deadlock"], ["slow query"]]
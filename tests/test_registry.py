@@ -0,0 +1,22 @@
+import logging
+
+from agents.registry import anomaly_detector_settings, parse_service_contamination
+
+
+def test_service_contamination_parses_valid_entries():
+    assert parse_service_contamination(" database=0.05, auth-service = 0.02 ,") == {
+        "database": 0.05, "auth-service": 0.02}
+
+
+def test_malformed_service_contamination_entries_are_skipped(caplog):
+    with caplog.at_level(logging.ERROR, logger="agents.registry"):
+        settings = parse_service_contamination("database,=0.1,web-server=high,cache=0.9,auth-service=0.02")
+
+    assert settings == {"auth-service": 0.02}
+    assert len(caplog.records) == 4
+
+
+def test_invalid_default_contamination_falls_back(monkeypatch):
+    monkeypatch.setenv("ANOMALY_CONTAMINATION", "10%")
+    monkeypatch.setenv("SERVICE_CONTAMINATION", "database")
+    assert anomaly_detector_settings() == {"contamination": 0.1, "service_contamination": {}}
@@ -0,0 +1,65 @@
+import json
+import re
+
+import pytest
+
+import agents.remediator as remediator_module
+from agents.remediator import RemediationAgent
+from agents.state_store import SQLiteStateBackend
+from agents.utils import TokenBudget
+
+
+def make_anomalies(count, level):
+    return [{"timestamp": f"2024-02-15T08:00:{i:02d}", "service": "database", "level": level,
+             "message": f"query timeout {i}"} for i in range(count)]
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    sent = []
+
+    def fake_call_openai(prompt, max_tokens=None):
+        sent.append(prompt)
+        count = len(re.findall(r"^=== ANOMALY \d+ ===$", prompt, re.MULTILINE))
+        if count == 0:
+            return "single answer"
+        return "\n".join(f"=== ANOMALY {i} ===\nanswer {i}" for i in range(1, count + 1))
+
+    monkeypatch.setattr(remediator_module, "call_openai", fake_call_openai)
+    return sent
+
+
+def test_deferred_anomalies_are_queued_not_saved_and_drained_most_severe_first(tmp_path, prompts):
+    agent = RemediationAgent(str(tmp_path), tokens_per_minute=1, batch_size=2)
+    warnings, criticals = make_anomalies(2, "WARNING"), make_anomalies(2, "CRITICAL")
+
+    remediations = agent.suggest_remediations(warnings + criticals)
+    assert [r["status"] for r in remediations] == ["deferred"] * 4
+    assert agent.deferred_count == 4
+    assert json.loads((tmp_path / "remediation_history.json").read_text()) == []
+
+    agent.budget.tokens_per_minute = agent.budget.remaining() + 1300
+    drained = agent.suggest_remediations([])
+    assert [r["anomaly"]["level"] for r in drained] == ["CRITICAL", "CRITICAL"]
+    assert all(r["status"] == "pending" for r in drained)
+    assert agent.deferred_count == 2
+
+
+def test_batched_remediations_store_the_prompt_that_was_sent(tmp_path, prompts):
+    agent = RemediationAgent(str(tmp_path), tokens_per_minute=100000, batch_size=3)
+    remediations = agent.suggest_remediations(make_anomalies(3, "ERROR"))
+
+    assert len(prompts) == 1
+    assert {r["query"] for r in remediations} == {prompts[0]}
+    assert len({r["batch_id"] for r in remediations}) == 1
+    assert [r["suggested_action"] for r in remediations] == ["answer 1", "answer 2", "answer 3"]
+
+
+def test_token_budget_is_shared_through_the_state_backend(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = TokenBudget(100, backend=SQLiteStateBackend(path))
+    second = TokenBudget(100, backend=SQLiteStateBackend(path))
+
+    assert first.try_reserve(60)
+    assert not second.try_reserve(60)
+    assert second.remaining() == 40
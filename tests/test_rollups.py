@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from agents.log_batch import LogBatch
+from agents.log_reader import LogReader
+from agents.rollups import SKETCH_GAMMA, RollupEngine, sketch_quantile
+
+HEADER = "timestamp,level,service,message,response_time\n"
+
+
+def make_engine(tmp_path):
+    logs = tmp_path / "logs"
+    logs.mkdir(exist_ok=True)
+    return RollupEngine(LogReader(str(logs)), segment_dir=str(tmp_path / "rollups")), logs / "app.csv"
+
+
+def test_sketch_quantiles_stay_within_relative_error_bound(tmp_path):
+    engine, _ = make_engine(tmp_path)
+    values = np.random.default_rng(0).lognormal(mean=5, sigma=1, size=20000)
+    engine.ingest(LogBatch(pd.DataFrame({
+        "timestamp": pd.Timestamp("2024-02-15T08:00:00Z"), "level": "INFO", "service": "web-server",
+        "message": "ok", "response_time": values,
+    })))
+
+    point = engine.timeseries("web-server")["web-server"][0]
+    bound = (SKETCH_GAMMA - 1) / 2 + 1e-3
+    for q in (50, 95, 99):
+        exact = np.quantile(values, q / 100)
+        assert abs(point[f"response_time_p{q}"] - exact) / exact <= bound
+    assert point["execution_time_p95"] is None
+
+
+def test_sketch_quantile_of_empty_sketch_is_none():
+    assert sketch_quantile({}, 0.5) is None
+
+
+def test_refresh_tails_complete_lines_and_resumes_from_segments(tmp_path):
+    engine, csv = make_engine(tmp_path)
+    csv.write_text(HEADER + "2024-02-15T08:00:01Z,INFO,web-server,ok,100ms\n"
+                            "2024-02-15T08:00:02Z,ERROR,web-server,fail,300ms\n")
+    assert engine.refresh() == 2
+
+    # A row still being written is left for the next refresh
+    with open(csv, "a") as f:
+        f.write("2024-02-15T08:00:03Z,INFO,web-server,ok,200ms\n2024-02-15T09:05:00Z,INF")
+    assert engine.refresh() == 1
+    with open(csv, "a") as f:
+        f.write("O,web-server,ok,50ms\n")
+    assert engine.refresh() == 1
+
+    series = engine.timeseries("web-server", minutes=120)["web-server"]
+    assert [(p["timestamp"], p["count"]) for p in series] == [
+        ("2024-02-15T08:00:00+00:00", 3), ("2024-02-15T09:05:00+00:00", 1)]
+    assert series[0]["error_rate"] == 1 / 3
+    assert sorted(path.name for path in (tmp_path / "rollups").glob("*T*.json")) == [
+        "20240215T08.json", "20240215T09.json"]
+
+    restarted, _ = make_engine(tmp_path)
+    assert restarted.refresh() == 0
+    assert restarted.timeseries("web-server", minutes=120)["web-server"] == series
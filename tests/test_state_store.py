@@ -0,0 +1,37 @@
+import threading
+import time
+
+import pytest
+
+from agents.state_store import MemoryStateBackend, SQLiteStateBackend, held_lease
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    return MemoryStateBackend() if request.param == "memory" else SQLiteStateBackend(str(tmp_path / "state.db"))
+
+
+def test_held_lease_excludes_other_callers_until_released(backend):
+    with held_lease(backend, "analysis", ttl_s=60) as first:
+        with held_lease(backend, "analysis", ttl_s=60) as second:
+            assert first and not second
+    with held_lease(backend, "analysis", ttl_s=60) as third:
+        assert third
+
+
+def test_held_lease_waits_for_the_holder(backend):
+    holding = threading.Event()
+
+    def hold():
+        with held_lease(backend, "analysis", ttl_s=60):
+            holding.set()
+            time.sleep(0.3)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait()
+    started = time.monotonic()
+    with held_lease(backend, "analysis", ttl_s=60, wait_s=5, poll_s=0.02) as acquired:
+        assert acquired
+        assert time.monotonic() - started >= 0.1
+    holder.join()